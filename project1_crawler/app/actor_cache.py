@@ -0,0 +1,157 @@
+"""
+Bluesky actor resolution cache: handle -> DID, one row per configured actor.
+
+Resolved DIDs are trusted for BSKY_DID_TTL_SECONDS, and feeds are fetched
+by DID so a handle change doesn't break the crawl. Actors that don't
+resolve (or whose feed comes back "not found") are cached as dead and only
+re-checked after BSKY_DEAD_RECHECK_SECONDS, doubling on every miss up to
+BSKY_DEAD_RECHECK_MAX_SECONDS. The producer skips them in between.
+
+A handle that resolves again doesn't reset the miss count, since taken-down
+and deactivated accounts still resolve; only a feed fetch that works does
+(mark_fetched), so those keep backing off too.
+"""
+from typing import Dict, List, Optional
+
+from config import (
+    BSKY_DID_TTL_SECONDS,
+    BSKY_DEAD_RECHECK_SECONDS,
+    BSKY_DEAD_RECHECK_MAX_SECONDS,
+)
+from logutil import get_logger
+
+logger = get_logger("actor_cache")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS bsky_actor_cache (
+    actor       text        PRIMARY KEY,
+    did         text,
+    resolved_at timestamptz,
+    failures    integer     NOT NULL DEFAULT 0,
+    next_check  timestamptz
+);
+"""
+
+# error text that means the actor is gone, not that the request failed
+_NOT_FOUND_MARKERS = ("Unable to resolve handle", "Profile not found", "InvalidRequest",
+                      "NotFound", "Record not found")
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def is_not_found(exc: Exception) -> bool:
+    if exc.__class__.__name__ in ("NotFoundError", "RecordNotFoundError"):
+        return True
+    return any(m in str(exc) for m in _NOT_FOUND_MARKERS)
+
+def live_actors(conn, actors: List[str]) -> List[str]:
+    """The actors that aren't dead-and-backing-off, in their original order. No commit."""
+    if not actors:
+        return []
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT actor FROM bsky_actor_cache "
+        "WHERE actor = ANY(%s) AND did IS NULL AND next_check > now()",
+        (list(actors),),
+    )
+    dead = {r[0] for r in cur.fetchall()}
+    cur.close()
+    return [a for a in actors if a not in dead]
+
+def mark_live(conn, actor: str, did: str) -> None:
+    """Handle resolved; failures are kept until the feed works (mark_fetched). No commit."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO bsky_actor_cache (actor, did, resolved_at, failures, next_check)
+        VALUES (%s, %s, now(), 0, NULL)
+        ON CONFLICT (actor) DO UPDATE SET
+            did = EXCLUDED.did, resolved_at = now(), next_check = NULL
+        """,
+        (actor, did),
+    )
+    cur.close()
+
+def mark_fetched(conn, actor: str) -> None:
+    """The actor's feed came back: reset its backoff. No commit."""
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute("UPDATE bsky_actor_cache SET failures = 0 WHERE actor = %s AND failures > 0",
+                (actor,))
+    cur.close()
+
+def mark_dead(conn, actor: str) -> None:
+    """Cache actor as unresolvable; each further miss doubles the wait. No commit."""
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO bsky_actor_cache (actor, did, failures, next_check)
+        VALUES (%s, NULL, 1, now() + make_interval(secs => %s))
+        ON CONFLICT (actor) DO UPDATE SET
+            did        = NULL,
+            failures   = bsky_actor_cache.failures + 1,
+            next_check = now() + make_interval(secs => LEAST(
+                %s * power(2, bsky_actor_cache.failures), %s))
+        """,
+        (actor, float(BSKY_DEAD_RECHECK_SECONDS),
+         float(BSKY_DEAD_RECHECK_SECONDS), float(BSKY_DEAD_RECHECK_MAX_SECONDS)),
+    )
+    cur.close()
+    logger.info(f"bsky: actor={actor} marked dead")
+
+def resolve(conn, client, actors: List[str]) -> Dict[str, Optional[str]]:
+    """
+    actor -> DID to fetch with, or None for actors that are dead (and not
+    yet due a re-check). Only expired or unknown handles cost a
+    resolveHandle call; transient errors fall back to the stale DID or the
+    handle itself rather than marking anyone dead. No commit.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT actor, did,
+               resolved_at > now() - make_interval(secs => %s),
+               next_check > now()
+        FROM bsky_actor_cache WHERE actor = ANY(%s)
+        """,
+        (float(BSKY_DID_TTL_SECONDS), list(actors)),
+    )
+    cached = {r[0]: r[1:] for r in cur.fetchall()}
+    cur.close()
+
+    out: Dict[str, Optional[str]] = {}
+    for actor in actors:
+        did, fresh, backing_off = cached.get(actor, (None, False, False))
+        if did is None and backing_off:
+            out[actor] = None
+        elif did and fresh:
+            out[actor] = did
+        elif actor.startswith("did:"):
+            # nothing to resolve; the feed request tells us if it's gone
+            out[actor] = actor
+        else:
+            try:
+                did = client.com.atproto.identity.resolve_handle({'handle': actor}).did
+            except Exception as e:
+                if not is_not_found(e):
+                    logger.warning(f"bsky: resolve actor={actor} failed: {e}")
+                    out[actor] = did or actor
+                    continue
+                mark_dead(conn, actor)
+                out[actor] = None
+                continue
+            mark_live(conn, actor, did)
+            out[actor] = did
+    return out
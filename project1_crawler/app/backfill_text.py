@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Fill the normalized-text columns (textnorm.py) for posts stored before
+they existed. Runs --workers processes; each claims --batch rows with
+text_plain IS NULL (FOR UPDATE SKIP LOCKED, so workers never collide),
+normalizes them and writes them back in one UPDATE per batch. Safe to
+stop and re-run: it resumes with whatever is still NULL.
+
+    python3 backfill_text.py --workers 4 --batch 2000
+    python3 backfill_text.py --table posts_bsky
+
+A partial index on the still-NULL rows keeps each claim cheap; it's
+built without blocking the crawler's inserts (CONCURRENTLY, or one chunk
+at a time on a hypertable) and dropped when a table is done.
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from psycopg2.extras import execute_values
+
+from config import DATABASE_URL
+from db import get_conn
+from logutil import get_logger
+from timescale import is_hypertable
+import textnorm
+
+logger = get_logger("backfill_text")
+
+_SET = ", ".join(f"{c} = v.{c}" for c in textnorm.COLUMNS)
+
+TABLES = {
+    "posts_4chan": {
+        "claim": """
+            SELECT board_name, thread_number, post_number, created_at, data->>'com'
+            FROM posts_4chan WHERE text_plain IS NULL
+            LIMIT %s FOR UPDATE SKIP LOCKED
+        """,
+        "update": f"""
+            UPDATE posts_4chan AS p SET {_SET}
+            FROM (VALUES %s) AS v (board_name, thread_number, post_number, created_at,
+                                   {", ".join(textnorm.COLUMNS)})
+            WHERE p.board_name = v.board_name AND p.thread_number = v.thread_number
+              AND p.post_number = v.post_number AND p.created_at = v.created_at
+        """,
+        "template": "(%s, %s::bigint, %s::bigint, %s::timestamptz, %s, %s::bigint[], %s::integer, %s::integer, %s::bigint)",
+        "values": lambda r: r[:4] + tuple(textnorm.chan_columns({"com": r[4]}).values()),
+    },
+    "posts_bsky": {
+        "claim": """
+            SELECT uri, created_at, data
+            FROM posts_bsky WHERE text_plain IS NULL
+            LIMIT %s FOR UPDATE SKIP LOCKED
+        """,
+        "update": f"""
+            UPDATE posts_bsky AS p SET {_SET}
+            FROM (VALUES %s) AS v (uri, created_at, {", ".join(textnorm.COLUMNS)})
+            WHERE p.uri = v.uri AND p.created_at = v.created_at
+        """,
+        "template": "(%s, %s::timestamptz, %s, %s::text[], %s::integer, %s::integer, %s::bigint)",
+        "values": lambda r: r[:2] + tuple(textnorm.bsky_columns(r[2]).values()),
+    },
+}
+
+def _index_name(table: str) -> str:
+    return f"{table}_text_backfill_idx"
+
+def _index_sql(conn, table: str):
+    """(create, drop) for the backfill index, neither holding a write lock for long."""
+    name = _index_name(table)
+    definition = f"{name} ON {table} (created_at) WHERE text_plain IS NULL"
+    if is_hypertable(conn, table):
+        # hypertables don't take CONCURRENTLY; this locks one chunk at a time
+        return (f"CREATE INDEX IF NOT EXISTS {definition} WITH (timescaledb.transaction_per_chunk)",
+                f"DROP INDEX IF EXISTS {name}")
+    return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {definition}",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def _worker(table: str, batch: int, dsn: str) -> int:
+    """Claim and normalize batches until none are left; returns rows updated."""
+    spec = TABLES[table]
+    conn = get_conn(dsn)
+    done = 0
+    try:
+        while True:
+            cur = conn.cursor()
+            cur.execute(spec["claim"], (batch,))
+            rows = cur.fetchall()
+            if not rows:
+                conn.rollback()
+                return done
+            execute_values(cur, spec["update"], [spec["values"](r) for r in rows],
+                           template=spec["template"], page_size=len(rows))
+            conn.commit()
+            cur.close()
+            done += len(rows)
+    finally:
+        conn.close()
+
+def backfill(table: str, workers: int, batch: int, dsn: str = DATABASE_URL) -> int:
+    conn = get_conn(dsn)
+    textnorm.ensure_schema(conn)
+    create_sql, drop_sql = _index_sql(conn, table)
+    conn.rollback()
+    # both statements refuse to run inside a transaction block
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(create_sql)
+
+    t0 = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_worker, table, batch, dsn) for _ in range(workers)]
+        total = sum(f.result() for f in futures)
+    secs = time.monotonic() - t0
+
+    cur.execute(drop_sql)
+    conn.close()
+    logger.info(f"backfill_text: table={table} rows={total} secs={secs:.1f} "
+                f"rows/sec={total / max(secs, 1e-9):,.0f}")
+    return total
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--table", choices=sorted(TABLES), action="append",
+                    help="default: both tables")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=2000)
+    ap.add_argument("--dsn", default=DATABASE_URL)
+    args = ap.parse_args()
+    for table in args.table or sorted(TABLES):
+        backfill(table, args.workers, args.batch, args.dsn)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from atproto_client import AsyncClient, SessionEvent
+from atproto_client import exceptions as at_ex
+
+from config import (
+    BSKY_HEAD_PAGES,
+    BSKY_ASYNC_CONCURRENCY,
+    BSKY_REQUESTS_PER_SECOND,
+    BSKY_RATE_BURST,
+    BSKY_MAX_429_RETRIES,
+    BSKY_HEAD_PROBE_LIMIT,
+    BSKY_BASE_URL,
+)
+from bsky_client import head_rows
+from bsky_client_cached import get_bsky_client, share_session
+from logutil import get_logger
+from ratelimit import AsyncTokenBucket, retry_after_seconds
+
+logger = get_logger("bsky_async")
+
+_NOT_FOUND_MARKERS = ("Profile not found", "InvalidRequest", "NotFound", "Record not found")
+
+def _status(exc) -> Optional[int]:
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+async def _get_author_feed(client: AsyncClient, bucket: AsyncTokenBucket,
+                           actor: str, cursor: Optional[str], limit: int = 100):
+    """
+    One getAuthorFeed page under the shared bucket. 429s put the whole
+    bucket on cool-down and retry. Returns (None, None) for gone actors,
+    same as worker.safe_get_author_feed.
+    """
+    for _ in range(BSKY_MAX_429_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            resp = await client.app.bsky.feed.get_author_feed({'actor': actor, 'cursor': cursor, 'limit': limit})
+            return list(resp.feed or []), getattr(resp, 'cursor', None)
+        except at_ex.RequestErrorBase as e:
+            if _status(e) == 429:
+                wait = retry_after_seconds(getattr(e.response, "headers", None))
+                logger.warning(f"bsky: 429 actor={actor} cooling down {wait:.0f}s")
+                bucket.penalize(wait)
+                continue
+            if isinstance(e, at_ex.BadRequestError) and any(m in str(e) for m in _NOT_FOUND_MARKERS):
+                logger.info(f"bsky: skip actor={actor} reason=profile-not-found")
+                return None, None
+            raise
+    raise RuntimeError(f"bsky: still rate limited after {BSKY_MAX_429_RETRIES} retries actor={actor}")
+
+async def _crawl_actor(client: AsyncClient, bucket: AsyncTokenBucket, sem: asyncio.Semaphore,
+                       actor: str, head: Optional[Tuple[datetime, str]], did: str):
+    """
+    HEAD crawl for one actor (fetched by `did`): newest first, up to
+    BSKY_HEAD_PAGES pages, stopping at the high-water mark. Returns
+    (rows, next_cursor, reached_head), or None if the actor is gone.
+    """
+    rows: List[dict] = []
+    next_cursor = None
+    reached_head = False
+    async with sem:
+        for page in range(BSKY_HEAD_PAGES):
+            limit = BSKY_HEAD_PROBE_LIMIT if head is not None and page == 0 else 100
+            feed, next_cursor = await _get_author_feed(client, bucket, did,
+                                                       next_cursor if page else None, limit)
+            if feed is None:
+                if page == 0:
+                    return None
+                break
+            page_rows, reached_head = head_rows(actor, feed, head)
+            rows.extend(page_rows)
+            if reached_head or not next_cursor:
+                break
+    return rows, next_cursor, reached_head
+
+async def _crawl_all(actors: List[str], heads: Dict[str, Tuple[datetime, str]],
+                     dids: Dict[str, str]) -> Dict[str, object]:
+    # reuse the process's logged-in session instead of another createSession
+    client = AsyncClient(base_url=BSKY_BASE_URL)
+
+    async def _on_session_change(event, session):
+        # a long pass can outlive the token; hand the refresh to the other workers
+        if event == SessionEvent.REFRESH:
+            await asyncio.to_thread(share_session, session.encode())
+
+    client.on_session_change(_on_session_change)
+    await client.login(session_string=get_bsky_client().export_session_string())
+
+    bucket = AsyncTokenBucket(BSKY_REQUESTS_PER_SECOND, BSKY_RATE_BURST)
+    sem = asyncio.Semaphore(BSKY_ASYNC_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_crawl_actor(client, bucket, sem, a, heads.get(a), dids.get(a) or a) for a in actors),
+        return_exceptions=True,
+    )
+    return dict(zip(actors, results))
+
+def crawl_actors(actors: List[str], heads: Optional[Dict[str, Tuple[datetime, str]]] = None,
+                 dids: Optional[Dict[str, str]] = None) -> Dict[str, object]:
+    """
+    HEAD-crawl every actor concurrently over one session and one rate limit.
+    Returns actor -> (rows, next_cursor, reached_head), None for an actor
+    that's gone, or an Exception if that actor failed; one bad actor
+    doesn't sink the rest of the pass.
+    """
+    return asyncio.run(_crawl_all(actors, heads or {}, dids or {}))
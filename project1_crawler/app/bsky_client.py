@@ -1,18 +1,24 @@
+import re
+from datetime import datetime, timezone
 from typing import Optional, Tuple, List
 from atproto import Client
 
+from config import BSKY_DATA_MODE, BSKY_BASE_URL
+import textnorm
+
 # Small wrapper so worker code stays clean
 
 def get_bsky_client(handle: str, app_password: str) -> Client:
-    client = Client()
+    client = Client(base_url=BSKY_BASE_URL)
     client.login(handle, app_password)
     return client
 
-def get_author_feed(client: Client, actor: str, cursor: Optional[str] = None) -> Tuple[List[object], Optional[str]]:
+def get_author_feed(client: Client, actor: str, cursor: Optional[str] = None,
+                    limit: int = 100) -> Tuple[List[object], Optional[str]]:
     """
     Returns (feed_items, next_cursor)
     """
-    resp = client.app.bsky.feed.get_author_feed({'actor': actor, 'cursor': cursor, 'limit': 100})
+    resp = client.app.bsky.feed.get_author_feed({'actor': actor, 'cursor': cursor, 'limit': limit})
     # resp.feed is a list of feed items (Pydantic models)
     next_cursor = getattr(resp, 'cursor', None)
     return list(resp.feed or []), next_cursor
@@ -29,3 +35,110 @@ def as_primitive(obj):
         return obj.__dict__
     except Exception:
         return str(obj)
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+def parse_ts(value) -> Optional[datetime]:
+    """indexed_at/created_at (ISO string, any fraction length, or datetime) -> aware datetime."""
+    if value is None or isinstance(value, datetime):
+        return value
+    s = str(value).replace('Z', '+00:00')
+    # fromisoformat wants exactly 3 or 6 fractional digits on older Pythons
+    s = _FRACTION.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), s, count=1)
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def feed_post(item):
+    """The post of an author-feed item, or None for reposts/pins/empties."""
+    if getattr(item, 'reason', None):
+        return None
+    return getattr(item, 'post', None)
+
+def _embed_projection(embed) -> Optional[dict]:
+    """The parts of an embed view readers use: link cards and image refs."""
+    if embed is None:
+        return None
+    out = {"py_type": getattr(embed, 'py_type', None)}
+    external = getattr(embed, 'external', None)
+    if external is not None:
+        out["external"] = {
+            "uri": getattr(external, 'uri', None),
+            "title": getattr(external, 'title', None),
+            "description": getattr(external, 'description', None),
+        }
+    images = getattr(embed, 'images', None)
+    if images:
+        out["images"] = [{"alt": getattr(i, 'alt', None), "fullsize": getattr(i, 'fullsize', None)}
+                         for i in images]
+    media = getattr(embed, 'media', None)
+    if media is not None:
+        out["media"] = _embed_projection(media)
+    return out
+
+def post_projection(post) -> dict:
+    """
+    Compact `data` for a post view: the fields we query plus the record,
+    with model_dump()'s keys, instead of dumping the whole view (author
+    profile, viewer state, labels, embed thumbnails...).
+    """
+    author = getattr(post, 'author', None)
+    return {
+        "uri": getattr(post, 'uri', None),
+        "cid": getattr(post, 'cid', None),
+        "author": {"did": getattr(author, 'did', None), "handle": getattr(author, 'handle', None)},
+        "record": as_primitive(getattr(post, 'record', None)),
+        "embed": _embed_projection(getattr(post, 'embed', None)),
+        "indexed_at": getattr(post, 'indexed_at', None),
+        "like_count": getattr(post, 'like_count', None),
+        "repost_count": getattr(post, 'repost_count', None),
+        "reply_count": getattr(post, 'reply_count', None),
+        "quote_count": getattr(post, 'quote_count', None),
+    }
+
+def post_row(actor: str, post) -> dict:
+    """posts_bsky row for one post view."""
+    data = post_projection(post) if BSKY_DATA_MODE == 'lean' else as_primitive(post)
+    return {
+        "actor": actor,
+        "uri": getattr(post, 'uri', None),
+        "created_at": getattr(post, 'indexed_at', None),
+        "data": data,
+        "stance": None,
+        "like_count": getattr(post, 'like_count', None),
+        "repost_count": getattr(post, 'repost_count', None),
+        "has_media": bool(getattr(post, 'embed', None)),
+        **textnorm.bsky_columns(data),
+    }
+
+def head_rows(actor: str, feed, head: Optional[Tuple[datetime, str]] = None) -> Tuple[List[dict], bool]:
+    """
+    Rows for the posts on one HEAD page that are newer than the actor's
+    high-water mark `head` = (indexed_at, uri), and whether the page reached
+    it (so paging can stop). Posts we already have are skipped before
+    they're serialized.
+    """
+    rows = []
+    reached = False
+    for item in feed:
+        post = feed_post(item)
+        if post is None:
+            continue
+        if head is not None:
+            ts = parse_ts(getattr(post, 'indexed_at', None))
+            if getattr(post, 'uri', None) == head[1] or (ts is not None and ts <= head[0]):
+                reached = True
+                continue
+        rows.append(post_row(actor, post))
+    return rows, reached
+
+def newest_head(rows: List[dict]) -> Optional[Tuple[datetime, str]]:
+    """(indexed_at, uri) of the newest row, to store as the next high-water mark."""
+    best = None
+    for r in rows:
+        ts = parse_ts(r["created_at"])
+        if ts is not None and (best is None or ts > best[0]):
+            best = (ts, r["uri"])
+    return best
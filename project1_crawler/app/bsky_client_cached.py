@@ -1,26 +1,112 @@
 import os
 import time
-from atproto_client import Client
+from atproto_client import Client, Session
 
 # we still want to reuse the helper fns from the original file
 # (these are the ones your worker already uses)
 from bsky_client import get_author_feed, as_primitive
+from config import BSKY_SESSION_STORE, BSKY_SESSION_REFRESH_MARGIN_SECONDS, BSKY_BASE_URL
+import session_store
 
 # read creds from env
 BSKY_HANDLE = os.getenv("BSKY_HANDLE")
 BSKY_APP_PASSWORD = os.getenv("BSKY_APP_PASSWORD")
 
-# global cached client
+# global cached client, and when its access token expires (epoch seconds)
 _CACHED_CLIENT = None
+_CACHED_EXP = 0
+# set while we hold the session lock, so the client's own callback doesn't re-lock
+_IN_LOGIN = False
+# atproto refreshes an access token by itself once it's this close to expiry;
+# the margin keeps our swap ahead of that, so only the lock holder refreshes
+ATPROTO_REFRESH_WINDOW_SECONDS = 15 * 60
+
+def _login(handle: str, app_password: str) -> Client:
+    last_exc = None
+    # a few retries just in case
+    for _ in range(5):
+        try:
+            client = Client(base_url=BSKY_BASE_URL)
+            client.login(handle, app_password)
+            return client
+        except Exception as e:
+            last_exc = e
+            time.sleep(2)
+
+    raise RuntimeError(f"Could not login to Bluesky after retries: {last_exc}")
+
+def share_session(session: str, handle: str = None) -> None:
+    """Save a session a client refreshed by itself, so the other workers pick it up."""
+    if BSKY_SESSION_STORE == "none":
+        return
+    try:
+        session_store.save(handle or BSKY_HANDLE, session)
+    except Exception as e:
+        print(f"[bsky] could not store refreshed session: {e}", flush=True)
+
+def _on_session_change(handle: str, client: Client) -> None:
+    """The client refreshed its tokens by itself: share them with the other workers."""
+    global _CACHED_EXP
+    session = client.export_session_string()
+    _CACHED_EXP = session_store.access_exp(session)
+    if not _IN_LOGIN:
+        share_session(session, handle)
+
+def _refreshed(stored: str) -> str:
+    """The stored session with new tokens, via com.atproto.server.refreshSession."""
+    session = Session.decode(stored)
+    resp = Client(base_url=BSKY_BASE_URL).com.atproto.server.refresh_session(
+        headers={"Authorization": f"Bearer {session.refresh_jwt}"})
+    return Session(resp.handle, resp.did, resp.access_jwt, resp.refresh_jwt, session.pds_endpoint).encode()
+
+def _shared_client(handle: str, app_password: str) -> Client:
+    """
+    Under the store lock: reuse the stored session if it has time left,
+    refresh it with its refresh token if it's about to expire, and only
+    fall back to createSession when there's nothing usable.
+
+    Cached clients are swapped BSKY_SESSION_REFRESH_MARGIN_SECONDS before
+    expiry, ahead of atproto's own refresh window, so the refresh happens
+    here, once, and not in every process that holds the old tokens.
+    """
+    global _IN_LOGIN
+    with session_store.locked(handle) as store:
+        _IN_LOGIN = True
+        try:
+            client = None
+            stored = store.load()
+            if stored:
+                try:
+                    if session_store.access_exp(stored) < time.time() + BSKY_SESSION_REFRESH_MARGIN_SECONDS:
+                        # proactive refresh: one process does it for the whole fleet
+                        stored = _refreshed(stored)
+                    client = Client(base_url=BSKY_BASE_URL)
+                    client.login(session_string=stored)
+                except Exception as e:
+                    print(f"[bsky] stored session unusable, logging in: {e}", flush=True)
+                    client = None
+            if client is None:
+                client = _login(handle, app_password)
+            store.save(client.export_session_string())
+        finally:
+            _IN_LOGIN = False
+    client.on_session_change(lambda *_: _on_session_change(handle, client))
+    return client
 
 def get_bsky_client(handle: str = None, app_password: str = None) -> Client:
     """
     Return ONE shared, logged-in Bluesky client.
-    We login once, then reuse, so we don't spam /createSession and hit 429.
+    The session is shared across processes through session_store, so N
+    workers do one login per token lifetime instead of one each per start.
+    The client is swapped for the stored (or a refreshed) session shortly
+    before its access token expires.
     """
-    global _CACHED_CLIENT
+    global _CACHED_CLIENT, _CACHED_EXP
 
-    if _CACHED_CLIENT is not None:
+    if _CACHED_CLIENT is not None and (
+        BSKY_SESSION_STORE == "none"
+        or time.time() < _CACHED_EXP - BSKY_SESSION_REFRESH_MARGIN_SECONDS
+    ):
         return _CACHED_CLIENT
 
     handle = handle or BSKY_HANDLE
@@ -29,16 +115,11 @@ def get_bsky_client(handle: str = None, app_password: str = None) -> Client:
     if not handle or not app_password:
         raise RuntimeError("BSKY_HANDLE / BSKY_APP_PASSWORD not set in env")
 
-    last_exc = None
-    # a few retries just in case
-    for _ in range(5):
-        try:
-            client = Client()
-            client.login(handle, app_password)
-            _CACHED_CLIENT = client
-            return _CACHED_CLIENT
-        except Exception as e:
-            last_exc = e
-            time.sleep(2)
+    if BSKY_SESSION_STORE == "none":
+        # per-process only: the old behaviour
+        _CACHED_CLIENT = _login(handle, app_password)
+        return _CACHED_CLIENT
 
-    raise RuntimeError(f"Could not login to Bluesky after retries: {last_exc}")
+    _CACHED_CLIENT = _shared_client(handle, app_password)
+    _CACHED_EXP = session_store.access_exp(_CACHED_CLIENT.export_session_string())
+    return _CACHED_CLIENT
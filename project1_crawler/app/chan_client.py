@@ -1,17 +1,132 @@
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from config import CHAN_REQUESTS_PER_SECOND, CHAN_FETCH_CONCURRENCY, CHAN_API_BASE
+from ratelimit import bucket_for
+import fastjson
+import metrics
+
+BASE = CHAN_API_BASE
+
+# one keep-alive session for the whole process; pool sized for the fetch threads
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(CHAN_FETCH_CONCURRENCY, 4))
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
+# url -> (etag, last_modified, body_size) from the last 200 response
+_VALIDATORS: Dict[str, Tuple[Optional[str], Optional[str], int]] = {}
+_LOCK = threading.Lock()
+_STATS = {"requests": 0, "not_modified": 0, "fetched": 0, "bytes_fetched": 0, "bytes_saved": 0}
+
+def _get(url: str, stage: str):
+    """
+    Conditional GET, timed as metrics stage `stage`. Returns None when the
+    server answers 304 Not Modified, otherwise the Response (status not yet
+    checked).
+    """
+    headers = {}
+    with _LOCK:
+        cached = _VALIDATORS.get(url)
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    # 4chan API etiquette: at most one request per second per host,
+    # shared across all fetch threads in this process
+    with metrics.timer("rate_limit_wait"):
+        bucket_for(url, CHAN_REQUESTS_PER_SECOND).acquire()
+    with metrics.timer(stage):
+        r = _SESSION.get(url, headers=headers, timeout=20)
+    metrics.inc("crawler_http_responses_total", host=urlsplit(url).netloc, status=str(r.status_code))
 
-BASE = "https://a.4cdn.org"
+    with _LOCK:
+        _STATS["requests"] += 1
+        if r.status_code == 304:
+            _STATS["not_modified"] += 1
+            _STATS["bytes_saved"] += cached[2] if cached else 0
+            return None
+        if r.status_code == 200:
+            size = len(r.content)
+            _STATS["fetched"] += 1
+            _STATS["bytes_fetched"] += size
+            etag = r.headers.get("ETag")
+            last_modified = r.headers.get("Last-Modified")
+            if etag or last_modified:
+                _VALIDATORS[url] = (etag, last_modified, size)
+    return r
+
+def forget(board: str, thread_no: int = None) -> None:
+    """Drop cached validators for a board (or one thread) so the next fetch is a full one."""
+    if thread_no is None:
+        prefix = f"{BASE}/{board}/"
+        urls = [u for u in list(_VALIDATORS) if u.startswith(prefix)]
+    else:
+        urls = [f"{BASE}/{board}/thread/{thread_no}.json",
+                f"{BASE}/{board}/thread/{thread_no}-tail.json"]
+    with _LOCK:
+        for url in urls:
+            _VALIDATORS.pop(url, None)
+
+def get_cache_stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(_STATS)
 
 def get_catalog(board: str):
+    """Catalog pages, or None if unchanged since the last fetch."""
     url = f"{BASE}/{board}/catalog.json"
-    r = requests.get(url, timeout=20)
+    r = _get(url, "catalog_fetch")
+    if r is None:
+        return None
     r.raise_for_status()
-    return r.json()
+    with metrics.timer("json_decode"):
+        return fastjson.loads(r.content)
 
 def get_thread(board: str, thread_no: int):
+    """Thread JSON, or None if unchanged since the last fetch."""
     url = f"{BASE}/{board}/thread/{thread_no}.json"
-    r = requests.get(url, timeout=20)
+    r = _get(url, "thread_fetch")
+    if r is None:
+        return None
     if r.status_code == 404:
         raise RuntimeError("Thread archived")
     r.raise_for_status()
-    return r.json()
+    with metrics.timer("json_decode"):
+        return fastjson.loads(r.content)
+
+def get_thread_tail(board: str, thread_no: int):
+    """
+    OP plus the last few replies (the -tail.json endpoint), or None if
+    unchanged since the last fetch. Callers must check the tail still
+    overlaps what they've already stored (see tail_covers).
+    """
+    url = f"{BASE}/{board}/thread/{thread_no}-tail.json"
+    r = _get(url, "thread_fetch")
+    if r is None:
+        return None
+    if r.status_code == 404:
+        raise RuntimeError("Thread archived")
+    r.raise_for_status()
+    with metrics.timer("json_decode"):
+        return fastjson.loads(r.content)
+
+def tail_covers(tail_json, last_seen: int) -> bool:
+    """True if every post newer than last_seen is inside this tail."""
+    posts = tail_json.get("posts", [])
+    if not posts:
+        return False
+    replies = posts[1:]
+    if len(replies) >= int(posts[0].get("replies", 0)):
+        # the whole thread fits in the tail
+        return True
+    if not replies:
+        # OP only, yet the thread has replies: can't tell what's missing
+        return False
+    return int(replies[0].get("no", 0)) <= last_seen
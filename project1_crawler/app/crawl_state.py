@@ -0,0 +1,325 @@
+"""
+Crawl state: per-thread 4chan high-water marks, per-actor Bluesky cursors
+and streaming (Jetstream) checkpoints.
+
+CRAWL_STATE_BACKEND=db (default) keeps one row per thread / actor in
+Postgres. Rows are written on the caller's connection without committing,
+so they land in the same transaction as the posts they describe.
+CRAWL_STATE_BACKEND=json is the old whole-file state/*.json behaviour.
+"""
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from psycopg2.extras import execute_values
+
+from config import (
+    CRAWL_STATE_BACKEND,
+    CHAN_STATE_GRACE_HOURS,
+    CHAN_LAST_SEEN_PATH,
+    CHAN_THREAD_META_PATH,
+    BSKY_CURSORS_PATH,
+    BSKY_HEADS_PATH,
+    BSKY_STREAM_CURSOR_PATH,
+)
+from state import load_json, save_json
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_state_4chan (
+    board_name    text        NOT NULL,
+    thread_number bigint      NOT NULL,
+    last_post     bigint      NOT NULL DEFAULT 0,
+    last_modified bigint,
+    replies       integer,
+    updated_at    timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (board_name, thread_number)
+);
+CREATE TABLE IF NOT EXISTS crawl_state_bsky (
+    actor      text        PRIMARY KEY,
+    cursor     text,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+-- newest post we've stored per actor (HEAD crawl high-water mark)
+ALTER TABLE crawl_state_bsky ADD COLUMN IF NOT EXISTS head_indexed_at timestamptz;
+ALTER TABLE crawl_state_bsky ADD COLUMN IF NOT EXISTS head_uri text;
+CREATE TABLE IF NOT EXISTS crawl_state_stream (
+    stream     text        PRIMARY KEY,
+    cursor     bigint      NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def _use_db() -> bool:
+    return CRAWL_STATE_BACKEND == "db"
+
+# ---------- 4chan ----------
+
+class BoardState:
+    """
+    last_seen: thread_no -> newest stored post number
+    meta:      thread_no -> [last_modified, replies] as of the last fetch
+    Changes are recorded with set_thread() and written by stage() (db) or
+    save() (json).
+    """
+
+    def __init__(self, board: str):
+        self.board = board
+        self.last_seen: Dict[int, int] = {}
+        self.meta: Dict[int, List[int]] = {}
+        self._dirty: Set[int] = set()
+
+    def load(self, conn) -> "BoardState":
+        if _use_db():
+            ensure_schema(conn)
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT thread_number, last_post, last_modified, replies "
+                "FROM crawl_state_4chan WHERE board_name = %s",
+                (self.board,),
+            )
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+            for thread_no, last_post, last_modified, replies in rows:
+                self.last_seen[thread_no] = last_post
+                if last_modified is not None:
+                    self.meta[thread_no] = [last_modified, replies or 0]
+            if rows:
+                return self
+
+        self._load_json()
+        if _use_db() and self.last_seen:
+            # first run on the db backend: carry over the JSON state once
+            self._dirty = set(self.last_seen) | set(self.meta)
+            self.stage(conn)
+            conn.commit()
+        return self
+
+    def load_thread(self, conn, thread_no: int) -> "BoardState":
+        """
+        db only: load a single thread's row without committing, so a
+        transaction-scoped lock taken by the caller stays held.
+        """
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT last_post, last_modified, replies FROM crawl_state_4chan "
+            "WHERE board_name = %s AND thread_number = %s",
+            (self.board, thread_no),
+        )
+        row = cur.fetchone()
+        cur.close()
+        if row is not None:
+            self.last_seen[thread_no] = row[0]
+            if row[1] is not None:
+                self.meta[thread_no] = [row[1], row[2] or 0]
+        return self
+
+    def _load_json(self) -> None:
+        last_seen_all = load_json(CHAN_LAST_SEEN_PATH)
+        for k, v in last_seen_all.get(self.board, {}).items():
+            self.last_seen[int(k)] = int(v)
+        meta_all = load_json(CHAN_THREAD_META_PATH)
+        for k, v in meta_all.get(self.board, {}).items():
+            self.meta[int(k)] = [int(v[0]), int(v[1])]
+
+    def set_thread(self, thread_no: int, last_post: Optional[int] = None,
+                   meta: Optional[List[int]] = None) -> None:
+        if last_post is not None:
+            self.last_seen[thread_no] = last_post
+        if meta is not None:
+            self.meta[thread_no] = meta
+        self._dirty.add(thread_no)
+
+    def stage(self, conn) -> None:
+        """Upsert changed threads on conn, inside the caller's transaction."""
+        if not _use_db() or not self._dirty:
+            return
+        values = []
+        for thread_no in self._dirty:
+            meta = self.meta.get(thread_no) or [None, None]
+            values.append((self.board, thread_no, self.last_seen.get(thread_no, 0), meta[0], meta[1]))
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO crawl_state_4chan
+                (board_name, thread_number, last_post, last_modified, replies)
+            VALUES %s
+            ON CONFLICT (board_name, thread_number) DO UPDATE SET
+                last_post     = GREATEST(crawl_state_4chan.last_post, EXCLUDED.last_post),
+                last_modified = COALESCE(EXCLUDED.last_modified, crawl_state_4chan.last_modified),
+                replies       = COALESCE(EXCLUDED.replies, crawl_state_4chan.replies),
+                updated_at    = now()
+            """,
+            values,
+        )
+        cur.close()
+        self._dirty.clear()
+
+    def prune(self, conn, live_threads: Iterable[int]) -> int:
+        """
+        Forget threads that are no longer in the catalog and haven't been
+        bumped for CHAN_STATE_GRACE_HOURS. Threads we never got catalog meta
+        for (legacy JSON entries) go as soon as they drop off the catalog.
+        db: deletes on conn without committing. Returns threads dropped.
+        """
+        live = set(live_threads)
+        cutoff = int(time.time() - CHAN_STATE_GRACE_HOURS * 3600)
+        dead = [
+            n for n in set(self.last_seen) | set(self.meta)
+            if n not in live and (n not in self.meta or self.meta[n][0] < cutoff)
+        ]
+        for n in dead:
+            self.last_seen.pop(n, None)
+            self.meta.pop(n, None)
+            self._dirty.discard(n)
+
+        if _use_db() and dead:
+            cur = conn.cursor()
+            cur.execute(
+                "DELETE FROM crawl_state_4chan "
+                "WHERE board_name = %s AND thread_number = ANY(%s)",
+                (self.board, dead),
+            )
+            cur.close()
+        return len(dead)
+
+    def save(self) -> None:
+        """json backend: rewrite this board's entries in the state files."""
+        if _use_db():
+            return
+        last_seen_all = load_json(CHAN_LAST_SEEN_PATH)
+        last_seen_all[self.board] = {str(k): v for k, v in self.last_seen.items()}
+        save_json(CHAN_LAST_SEEN_PATH, last_seen_all)
+        meta_all = load_json(CHAN_THREAD_META_PATH)
+        meta_all[self.board] = {str(k): v for k, v in self.meta.items()}
+        save_json(CHAN_THREAD_META_PATH, meta_all)
+        self._dirty.clear()
+
+def try_lock_thread(conn, board: str, thread_no: int) -> bool:
+    """
+    Non-blocking advisory lock on (board, thread), scoped to conn's current
+    transaction: commit or rollback releases it. Lets workers on any host
+    split a board without two of them fetching the same thread at once.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT pg_try_advisory_xact_lock(hashtext(%s), %s)",
+        ("4chan:" + board, thread_no & 0x7FFFFFFF),
+    )
+    locked = cur.fetchone()[0]
+    cur.close()
+    return bool(locked)
+
+# ---------- Bluesky ----------
+
+def load_cursor(conn, actor: str) -> Optional[str]:
+    if _use_db():
+        ensure_schema(conn)
+        cur = conn.cursor()
+        cur.execute("SELECT cursor FROM crawl_state_bsky WHERE actor = %s", (actor,))
+        row = cur.fetchone()
+        cur.close()
+        conn.commit()
+        if row is not None:
+            return row[0]
+    # json backend, or an actor not yet migrated to the table
+    return load_json(BSKY_CURSORS_PATH).get(actor)
+
+def save_cursor(conn, actor: str, cursor: str) -> None:
+    """db: upsert on conn without committing. json: rewrite the cursors file."""
+    if _use_db():
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO crawl_state_bsky (actor, cursor) VALUES (%s, %s)
+            ON CONFLICT (actor) DO UPDATE SET cursor = EXCLUDED.cursor, updated_at = now()
+            """,
+            (actor, cursor),
+        )
+        cur.close()
+        return
+    cursors = load_json(BSKY_CURSORS_PATH)
+    cursors[actor] = cursor
+    save_json(BSKY_CURSORS_PATH, cursors)
+
+def load_heads(conn, actors: List[str]) -> Dict[str, Tuple[datetime, str]]:
+    """actor -> (indexed_at, uri) of the newest post stored for it."""
+    if _use_db():
+        ensure_schema(conn)
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT actor, head_indexed_at, head_uri FROM crawl_state_bsky "
+            "WHERE actor = ANY(%s) AND head_indexed_at IS NOT NULL",
+            (list(actors),),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        conn.commit()
+        return {actor: (ts, uri) for actor, ts, uri in rows}
+    heads = load_json(BSKY_HEADS_PATH)
+    return {a: (datetime.fromisoformat(heads[a][0]), heads[a][1]) for a in actors if a in heads}
+
+def save_head(conn, actor: str, head: Tuple[datetime, str]) -> None:
+    """Move the actor's high-water mark forward. db: no commit (rides with the posts)."""
+    if _use_db():
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO crawl_state_bsky (actor, head_indexed_at, head_uri) VALUES (%s, %s, %s)
+            ON CONFLICT (actor) DO UPDATE SET
+                head_indexed_at = EXCLUDED.head_indexed_at,
+                head_uri        = EXCLUDED.head_uri,
+                updated_at      = now()
+            WHERE crawl_state_bsky.head_indexed_at IS NULL
+               OR crawl_state_bsky.head_indexed_at < EXCLUDED.head_indexed_at
+            """,
+            (actor, head[0], head[1]),
+        )
+        cur.close()
+        return
+    heads = load_json(BSKY_HEADS_PATH)
+    heads[actor] = [head[0].isoformat(), head[1]]
+    save_json(BSKY_HEADS_PATH, heads)
+
+def load_stream_cursor(conn, stream: str) -> Optional[int]:
+    """Last checkpointed event time (microseconds) for a stream, or None."""
+    if _use_db():
+        ensure_schema(conn)
+        cur = conn.cursor()
+        cur.execute("SELECT cursor FROM crawl_state_stream WHERE stream = %s", (stream,))
+        row = cur.fetchone()
+        cur.close()
+        conn.commit()
+        return row[0] if row else None
+    return load_json(BSKY_STREAM_CURSOR_PATH).get(stream)
+
+def save_stream_cursor(conn, stream: str, cursor: int) -> None:
+    """db: upsert on conn without committing. json: rewrite the file."""
+    if _use_db():
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO crawl_state_stream (stream, cursor) VALUES (%s, %s)
+            ON CONFLICT (stream) DO UPDATE SET
+                cursor = GREATEST(crawl_state_stream.cursor, EXCLUDED.cursor), updated_at = now()
+            """,
+            (stream, cursor),
+        )
+        cur.close()
+        return
+    cursors = load_json(BSKY_STREAM_CURSOR_PATH)
+    cursors[stream] = cursor
+    save_json(BSKY_STREAM_CURSOR_PATH, cursors)
@@ -1,12 +1,237 @@
+import functools
+import io
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
 import psycopg2
 from psycopg2.extras import Json
-from typing import List, Dict, Any
-from config import DATABASE_URL
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Dict, Any, Sequence
+from config import (
+    DATABASE_URL,
+    DB_INGEST_MODE,
+    DB_COPY_BATCH_ROWS,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_CHECK_IDLE_SECONDS,
+)
+import fastjson
+import metrics
+import textnorm
 
 def get_conn(url: str = DATABASE_URL):
     return psycopg2.connect(url)
 
-def insert_4chan_posts(conn, rows: List[Dict[str, Any]]) -> int:
+# ---------- connection pool ----------
+
+# dsn -> pool; created lazily so forked job processes build their own
+_POOLS: Dict[str, ThreadedConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+# id(conn) -> monotonic time it was last handed back
+_LAST_USED: Dict[int, float] = {}
+
+def get_pool(url: str = DATABASE_URL) -> ThreadedConnectionPool:
+    with _POOLS_LOCK:
+        pool = _POOLS.get(url)
+        if pool is None:
+            pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, url)
+            _POOLS[url] = pool
+        return pool
+
+def _healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    idle = time.monotonic() - _LAST_USED.get(id(conn), 0.0)
+    if idle < DB_POOL_CHECK_IDLE_SECONDS:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchone()
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+@contextmanager
+def pooled_conn(url: str = DATABASE_URL):
+    """
+    Borrow a connection from the process-wide pool for `url`.
+    Connections that fail the health check (or break while borrowed)
+    are closed and replaced instead of going back into the pool.
+    """
+    pool = get_pool(url)
+    conn = pool.getconn()
+    if not _healthy(conn):
+        _LAST_USED.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        broken = broken or bool(conn.closed)
+        if broken:
+            _LAST_USED.pop(id(conn), None)
+        else:
+            _LAST_USED[id(conn)] = time.monotonic()
+        # putconn rolls back anything the caller left open
+        pool.putconn(conn, close=broken)
+
+_4CHAN_COLS = ("board_name", "thread_number", "post_number", "created_at", "data", "has_media")
+_4CHAN_CONFLICT = "(board_name, thread_number, post_number, created_at)"
+
+_BSKY_COLS = ("actor", "uri", "created_at", "data",
+              "stance", "like_count", "repost_count", "has_media")
+_BSKY_CONFLICT = "(uri, created_at)"
+# polling stores a post at its AppView indexedAt, Jetstream at the event
+# time; both are within seconds of each other, so an existing row with
+# the same uri inside this window is the same post from the other path
+_BSKY_SAME_POST_WINDOW = "1 day"
+
+def _drop_known_bsky(conn, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    rows minus posts already stored under another created_at, which the
+    (uri, created_at) conflict key alone would let through. No commit.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT DISTINCT p.uri
+        FROM unnest(%s::text[], %s::timestamptz[]) AS v (uri, created_at)
+        JOIN posts_bsky p
+          ON p.uri = v.uri
+         AND p.created_at BETWEEN v.created_at - interval '{_BSKY_SAME_POST_WINDOW}'
+                              AND v.created_at + interval '{_BSKY_SAME_POST_WINDOW}'
+         AND p.created_at <> v.created_at
+        """,
+        ([r["uri"] for r in rows], [r["created_at"] for r in rows]),
+    )
+    known = {u for (u,) in cur.fetchall()}
+    cur.close()
+    return [r for r in rows if r["uri"] not in known] if known else rows
+
+# ---------- normalized-text columns ----------
+
+# table -> whether textnorm's columns exist; checked once per process
+_TEXT_COLS: Dict[str, bool] = {}
+
+def _has_text_columns(conn, table: str) -> bool:
+    """
+    Writers only include the textnorm.py columns once the table has them,
+    so anything running before textnorm.ensure_schema keeps working (rows
+    it writes get their text from backfill_text.py). No commit.
+    """
+    has = _TEXT_COLS.get(table)
+    if has is None:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT count(*) FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s AND column_name = ANY(%s)
+            """,
+            (table, list(textnorm.COLUMNS)),
+        )
+        has = _TEXT_COLS[table] = cur.fetchone()[0] == len(textnorm.COLUMNS)
+        cur.close()
+    return has
+
+def _text_sql(array_type: str):
+    """(column list, executemany placeholders) to append for the text columns."""
+    return (", " + ", ".join(textnorm.COLUMNS),
+            ", %(text_plain)s, %(quote_links)s::" + array_type +
+            ", %(char_count)s, %(word_count)s, %(text_hash)s")
+
+# ---------- COPY path ----------
+
+def _array_literal(values) -> str:
+    """Postgres array input syntax, every element quoted."""
+    return "{" + ",".join(
+        "NULL" if x is None else '"' + str(x).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for x in values
+    ) + "}"
+
+def _copy_field(v) -> str:
+    """Encode one value for COPY ... FROM STDIN (text format)."""
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, datetime):
+        s = v.isoformat()
+    elif isinstance(v, dict):
+        s = fastjson.dumps(v)
+    elif isinstance(v, (list, tuple)):
+        s = _array_literal(v)
+    else:
+        s = str(v)
+    return (s.replace("\\", "\\\\")
+             .replace("\t", "\\t")
+             .replace("\n", "\\n")
+             .replace("\r", "\\r"))
+
+def _copy_merge(conn, table: str, cols: Sequence[str], conflict: str,
+                rows: List[Dict[str, Any]]) -> int:
+    """
+    COPY rows into a per-session temp staging table (temp tables skip WAL,
+    like UNLOGGED ones), then merge with INSERT ... SELECT ... ON CONFLICT
+    DO NOTHING. The merge's rowcount is the real number of new rows.
+    """
+    stage = f"_stage_{table}"
+    col_list = ", ".join(cols)
+    cur = conn.cursor()
+    cur.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS AS "
+        f"SELECT {col_list} FROM {table} WITH NO DATA"
+    )
+
+    inserted = 0
+    for start in range(0, len(rows), DB_COPY_BATCH_ROWS):
+        chunk = rows[start:start + DB_COPY_BATCH_ROWS]
+        buf = io.StringIO()
+        for r in chunk:
+            buf.write("\t".join(_copy_field(r.get(c)) for c in cols))
+            buf.write("\n")
+        buf.seek(0)
+
+        # a previous merge in this same transaction may have left rows behind
+        cur.execute(f"TRUNCATE {stage}")
+        cur.copy_expert(f"COPY {stage} ({col_list}) FROM STDIN", buf)
+        cur.execute(
+            f"INSERT INTO {table} ({col_list}) "
+            f"SELECT {col_list} FROM {stage} "
+            f"ON CONFLICT {conflict} DO NOTHING"
+        )
+        inserted += cur.rowcount
+    cur.close()
+    return inserted
+
+# ---------- inserts ----------
+
+def _instrumented(table: str):
+    """Time an insert function as stage db_insert and count the rows it added."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(conn, rows, *args, **kwargs):
+            if not rows:
+                return 0
+            with metrics.timer("db_insert", table=table):
+                inserted = fn(conn, rows, *args, **kwargs)
+            metrics.inc("crawler_rows_inserted_total", inserted, table=table)
+            return inserted
+        return wrapper
+    return deco
+
+@_instrumented("posts_4chan")
+def insert_4chan_posts(conn, rows: List[Dict[str, Any]], mode: str = DB_INGEST_MODE,
+                       commit: bool = True) -> int:
     """
     rows = [{
         "board_name": str,
@@ -16,10 +241,21 @@ def insert_4chan_posts(conn, rows: List[Dict[str, Any]]) -> int:
         "data": dict,
         "has_media": bool,
     }, ...]
+    mode: 'copy' (bulk, default) or 'executemany' (row-at-a-time fallback)
+    commit=False leaves the transaction open so callers can write crawl
+    state alongside the posts and commit both together.
     """
     if not rows:
         return 0
 
+    with_text = _has_text_columns(conn, "posts_4chan")
+    if mode == "copy":
+        cols = _4CHAN_COLS + (textnorm.COLUMNS if with_text else ())
+        inserted = _copy_merge(conn, "posts_4chan", cols, _4CHAN_CONFLICT, rows)
+        if commit:
+            conn.commit()
+        return inserted
+
     # wrap each row's "data" dict so psycopg2 can send it to jsonb
     db_rows = []
     for r in rows:
@@ -28,29 +264,34 @@ def insert_4chan_posts(conn, rows: List[Dict[str, Any]]) -> int:
             "thread_number": r["thread_number"],
             "post_number":   r["post_number"],
             "created_at":    r["created_at"],
-            "data":          Json(r["data"]),
+            "data":          Json(r["data"], dumps=fastjson.dumps),
             "has_media":     r["has_media"],
+            **({c: r.get(c) for c in textnorm.COLUMNS} if with_text else {}),
         })
 
+    text_cols, text_vals = _text_sql("bigint[]") if with_text else ("", "")
     cur = conn.cursor()
     cur.executemany(
-        """
+        f"""
         INSERT INTO posts_4chan
-            (board_name, thread_number, post_number, created_at, data, has_media)
+            (board_name, thread_number, post_number, created_at, data, has_media{text_cols})
         VALUES
             (%(board_name)s, %(thread_number)s, %(post_number)s,
-             %(created_at)s, %(data)s, %(has_media)s)
+             %(created_at)s, %(data)s, %(has_media)s{text_vals})
         ON CONFLICT (board_name, thread_number, post_number, created_at)
         DO NOTHING
         """,
         db_rows,
     )
     inserted = cur.rowcount
-    conn.commit()
+    if commit:
+        conn.commit()
     cur.close()
     return inserted
 
-def insert_bsky_posts(conn, rows: List[Dict[str, Any]]) -> int:
+@_instrumented("posts_bsky")
+def insert_bsky_posts(conn, rows: List[Dict[str, Any]], mode: str = DB_INGEST_MODE,
+                      commit: bool = True) -> int:
     """
     rows = [{
         "actor": str,
@@ -62,10 +303,29 @@ def insert_bsky_posts(conn, rows: List[Dict[str, Any]]) -> int:
         "repost_count": int|None,
         "has_media": bool|None,
     }, ...]
+    mode: 'copy' (bulk, default) or 'executemany' (row-at-a-time fallback)
+    commit=False leaves the transaction open so callers can write crawl
+    state alongside the posts and commit both together.
+    Posts already stored by the other ingest path (see _drop_known_bsky)
+    are skipped.
     """
     if not rows:
         return 0
 
+    rows = _drop_known_bsky(conn, rows)
+    if not rows:
+        if commit:
+            conn.commit()
+        return 0
+
+    with_text = _has_text_columns(conn, "posts_bsky")
+    if mode == "copy":
+        cols = _BSKY_COLS + (textnorm.COLUMNS if with_text else ())
+        inserted = _copy_merge(conn, "posts_bsky", cols, _BSKY_CONFLICT, rows)
+        if commit:
+            conn.commit()
+        return inserted
+
     # wrap JSON field
     db_rows = []
     for r in rows:
@@ -73,28 +333,31 @@ def insert_bsky_posts(conn, rows: List[Dict[str, Any]]) -> int:
             "actor":         r["actor"],
             "uri":           r["uri"],
             "created_at":    r["created_at"],
-            "data":          Json(r["data"]),
+            "data":          Json(r["data"], dumps=fastjson.dumps),
             "stance":        r["stance"],
             "like_count":    r["like_count"],
             "repost_count":  r["repost_count"],
             "has_media":     r["has_media"],
+            **({c: r.get(c) for c in textnorm.COLUMNS} if with_text else {}),
         })
 
+    text_cols, text_vals = _text_sql("text[]") if with_text else ("", "")
     cur = conn.cursor()
     cur.executemany(
-        """
+        f"""
         INSERT INTO posts_bsky
             (actor, uri, created_at, data,
-             stance, like_count, repost_count, has_media)
+             stance, like_count, repost_count, has_media{text_cols})
         VALUES
             (%(actor)s, %(uri)s, %(created_at)s, %(data)s,
-             %(stance)s, %(like_count)s, %(repost_count)s, %(has_media)s)
+             %(stance)s, %(like_count)s, %(repost_count)s, %(has_media)s{text_vals})
         ON CONFLICT (uri, created_at)
         DO NOTHING
         """,
         db_rows,
     )
     inserted = cur.rowcount
-    conn.commit()
+    if commit:
+        conn.commit()
     cur.close()
     return inserted
@@ -1,59 +1,69 @@
 import os
-import psycopg2
+from psycopg2.extras import execute_values
+
+from db import pooled_conn
 
 DSN = os.getenv("PG_DSN", "dbname=crawler user=postgres host=timescaledb")
+BATCH_ROWS = int(os.getenv("PG_SPLIT_BATCH_ROWS", "1000"))
 
-def _get_conn():
-    return psycopg2.connect(DSN)
+# board -> split table; anything else is rejected rather than formatted into SQL
+TABLES = {
+    "sp": "posts_4chan_sp",
+    "pol": "posts_4chan_pol",
+}
 
-def insert_sp(posts):
+def _write_batch(conn, table, values):
+    """One multi-row INSERT in one transaction; returns rows actually inserted."""
+    try:
+        with conn.cursor() as cur:
+            inserted = execute_values(
+                cur,
+                f"""
+                INSERT INTO {table} (board, thread_id, post_id, author, content, created_at)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+                """,
+                values,
+                page_size=len(values),
+                fetch=True,
+            )
+        conn.commit()
+        return len(inserted)
+    except Exception:
+        conn.rollback()
+        raise
+
+def insert_posts(board, posts):
+    """
+    Batch-insert posts into the split table for `board`.
+    posts = [{"board", "thread_id", "post_id", "author", "content", "created_at"}, ...]
+    Returns the number of new rows (duplicates are not counted).
+    """
     if not posts:
         return 0
-    conn = _get_conn()
-    cur = conn.cursor()
-    for p in posts:
-        cur.execute(
-            """
-            INSERT INTO posts_4chan_sp (board, thread_id, post_id, author, content, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING;
-            """,
-            (
-                p["board"],
-                p.get("thread_id"),
-                p["post_id"],
-                p.get("author"),
-                p.get("content"),
-                p["created_at"],
-            ),
+    table = TABLES[board]
+    values = [
+        (
+            p["board"],
+            p.get("thread_id"),
+            p["post_id"],
+            p.get("author"),
+            p.get("content"),
+            p["created_at"],
         )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return len(posts)
+        for p in posts
+    ]
+
+    inserted = 0
+    # db's process-wide pool handles reuse and reconnecting stale connections
+    with pooled_conn(DSN) as conn:
+        for start in range(0, len(values), BATCH_ROWS):
+            inserted += _write_batch(conn, table, values[start:start + BATCH_ROWS])
+    return inserted
+
+def insert_sp(posts):
+    return insert_posts("sp", posts)
 
 def insert_pol(posts):
-    if not posts:
-        return 0
-    conn = _get_conn()
-    cur = conn.cursor()
-    for p in posts:
-        cur.execute(
-            """
-            INSERT INTO posts_4chan_pol (board, thread_id, post_id, author, content, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING;
-            """,
-            (
-                p["board"],
-                p.get("thread_id"),
-                p["post_id"],
-                p.get("author"),
-                p.get("content"),
-                p["created_at"],
-            ),
-        )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return len(posts)
+    return insert_posts("pol", posts)
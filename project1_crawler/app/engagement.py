@@ -0,0 +1,146 @@
+"""
+Bluesky engagement refresh. posts_bsky keeps the counts from the first
+crawl (inserts are ON CONFLICT DO NOTHING), so this re-reads recent posts
+with app.bsky.feed.getPosts, 25 URIs per call, instead of re-paging feeds.
+
+Which posts are due depends on their age (ENGAGEMENT_TIERS, e.g.
+"1:900,24:3600,168:21600": posts under 1h old every 15 min, under a day
+every hour, under a week every 6h; older posts are left alone). Each
+refresh appends a row per post to bsky_engagement (the time series) and
+updates the counts on posts_bsky that the dashboard reads.
+"""
+from typing import Dict, List, Tuple
+
+from psycopg2.extras import execute_values
+
+from config import (
+    ENGAGEMENT_TIERS,
+    ENGAGEMENT_MAX_POSTS,
+    BSKY_REQUESTS_PER_SECOND,
+    BSKY_RATE_BURST,
+)
+from ratelimit import TokenBucket
+
+GET_POSTS_MAX_URIS = 25
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS bsky_engagement (
+    uri          text        NOT NULL,
+    captured_at  timestamptz NOT NULL DEFAULT now(),
+    like_count   integer,
+    repost_count integer,
+    reply_count  integer,
+    quote_count  integer,
+    PRIMARY KEY (uri, captured_at)
+);
+-- when the counts on posts_bsky were last refreshed
+ALTER TABLE posts_bsky ADD COLUMN IF NOT EXISTS engagement_at timestamptz;
+"""
+
+_SCHEMA_READY = False
+_BUCKET = TokenBucket(BSKY_REQUESTS_PER_SECOND, BSKY_RATE_BURST)
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def parse_tiers(spec: str) -> List[Tuple[float, float]]:
+    """Parse "1:900,24:3600" into [(max_age_hours, every_seconds), ...], youngest first."""
+    tiers = []
+    for part in spec.split(","):
+        if part.strip():
+            age, every = part.split(":")
+            tiers.append((float(age), float(every)))
+    return sorted(tiers)
+
+def due_posts(conn, limit: int = ENGAGEMENT_MAX_POSTS) -> List[tuple]:
+    """
+    (uri, created_at) of posts whose age tier says they're due,
+    never-refreshed first. No commit.
+    """
+    tiers = parse_tiers(ENGAGEMENT_TIERS)
+    if not tiers:
+        return []
+    ensure_schema(conn)
+    whens = " ".join(
+        "WHEN created_at > now() - make_interval(hours => %s) THEN make_interval(secs => %s)"
+        for _ in tiers
+    )
+    params: List[float] = [v for tier in tiers for v in tier]
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT uri, created_at FROM posts_bsky
+        WHERE created_at > now() - make_interval(hours => %s)
+          AND (engagement_at IS NULL OR engagement_at < now() - CASE {whens} END)
+        ORDER BY engagement_at NULLS FIRST, created_at DESC
+        LIMIT %s
+        """,
+        [tiers[-1][0]] + params + [limit],
+    )
+    posts = cur.fetchall()
+    cur.close()
+    return posts
+
+def fetch_counts(client, uris: List[str]) -> Dict[str, tuple]:
+    """uri -> (likes, reposts, replies, quotes) via getPosts; deleted posts are absent."""
+    counts: Dict[str, tuple] = {}
+    for i in range(0, len(uris), GET_POSTS_MAX_URIS):
+        _BUCKET.acquire()
+        resp = client.app.bsky.feed.get_posts({'uris': uris[i:i + GET_POSTS_MAX_URIS]})
+        for post in resp.posts or []:
+            counts[post.uri] = (
+                getattr(post, 'like_count', None),
+                getattr(post, 'repost_count', None),
+                getattr(post, 'reply_count', None),
+                getattr(post, 'quote_count', None),
+            )
+    return counts
+
+def store_counts(conn, posts: List[tuple], counts: Dict[str, tuple]) -> int:
+    """
+    Append the snapshots and update posts_bsky, batched, without committing.
+    posts are due_posts' (uri, created_at) pairs; matching on the full key
+    lets the update use the primary key instead of scanning for the uri.
+    Every requested post is stamped so deleted ones aren't asked for again
+    until their next tier interval. Returns posts updated.
+    """
+    cur = conn.cursor()
+    if counts:
+        execute_values(
+            cur,
+            """
+            INSERT INTO bsky_engagement (uri, like_count, repost_count, reply_count, quote_count)
+            VALUES %s
+            ON CONFLICT (uri, captured_at) DO UPDATE SET
+                like_count   = EXCLUDED.like_count,
+                repost_count = EXCLUDED.repost_count,
+                reply_count  = EXCLUDED.reply_count,
+                quote_count  = EXCLUDED.quote_count
+            """,
+            [(uri,) + c for uri, c in counts.items()],
+        )
+    execute_values(
+        cur,
+        """
+        UPDATE posts_bsky AS p SET
+            like_count    = COALESCE(v.like_count, p.like_count),
+            repost_count  = COALESCE(v.repost_count, p.repost_count),
+            engagement_at = now()
+        FROM (VALUES %s) AS v (uri, created_at, like_count, repost_count)
+        WHERE p.uri = v.uri AND p.created_at = v.created_at
+        """,
+        [(uri, created_at) + (counts[uri][:2] if uri in counts else (None, None))
+         for uri, created_at in posts],
+        template="(%s, %s::timestamptz, %s::integer, %s::integer)",
+        page_size=max(len(posts), 1),
+    )
+    updated = cur.rowcount
+    cur.close()
+    return updated
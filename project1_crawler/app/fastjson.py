@@ -0,0 +1,22 @@
+"""
+One-pass JSON encoding for jsonb columns: orjson when installed (C, about
+an order of magnitude faster than the stdlib), json otherwise.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> str:
+    """Compact JSON text; datetimes become ISO strings, anything unknown str()."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":"))
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,87 @@
+"""
+Unique-job bookkeeping: at most one queued-or-running Faktory job per key
+("board:sp", "actor:x", "thread:pol:123"). Whoever enqueues claims the key
+first; the worker releases it when the job succeeds, and the enqueuer
+when the push fails. A failed job keeps its claim while Faktory retries
+it, and gives it up once it has failed JOB_RETRIES + 1 times (Faktory
+moves it to the dead set then). A claim older than
+JOB_INFLIGHT_TTL_SECONDS is treated as lost (crashed worker) and can be
+taken again.
+"""
+from typing import List, Optional
+
+from config import JOB_INFLIGHT_TTL_SECONDS, JOB_RETRIES
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_inflight (
+    job_key     text        PRIMARY KEY,
+    enqueued_at timestamptz NOT NULL DEFAULT now()
+);
+-- failed runs of the job holding the claim
+ALTER TABLE crawl_inflight ADD COLUMN IF NOT EXISTS failures integer NOT NULL DEFAULT 0;
+"""
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def claim(conn, keys: List[str]) -> List[str]:
+    """Claim the keys with no live job; returns the ones we may enqueue. No commit."""
+    if not keys:
+        return []
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO crawl_inflight (job_key)
+        SELECT unnest(%s::text[])
+        ON CONFLICT (job_key) DO UPDATE SET enqueued_at = now(), failures = 0
+            WHERE crawl_inflight.enqueued_at < now() - make_interval(secs => %s)
+        RETURNING job_key
+        """,
+        (keys, float(JOB_INFLIGHT_TTL_SECONDS)),
+    )
+    claimed = [r[0] for r in cur.fetchall()]
+    cur.close()
+    return claimed
+
+def fail(conn, key: str) -> bool:
+    """
+    Count a failed run; on the last one Faktory will retry, drop the claim
+    so the key can be enqueued again. Returns whether it was dropped. No commit.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE crawl_inflight SET failures = failures + 1 WHERE job_key = %s RETURNING failures",
+        (key,),
+    )
+    row = cur.fetchone()
+    dead = row is not None and row[0] > JOB_RETRIES
+    if dead:
+        cur.execute("DELETE FROM crawl_inflight WHERE job_key = %s", (key,))
+    cur.close()
+    return dead
+
+def release(conn, key: str) -> Optional[float]:
+    """
+    Job finished (or failed): let the key be enqueued again. No commit.
+    Returns when the key was claimed (epoch seconds), if it was.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        "DELETE FROM crawl_inflight WHERE job_key = %s RETURNING EXTRACT(EPOCH FROM enqueued_at)",
+        (key,),
+    )
+    row = cur.fetchone()
+    cur.close()
+    return float(row[0]) if row else None
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Streaming Bluesky ingest: subscribe to Jetstream for new posts by the DIDs
+of BSKY_ACTORS and write them to posts_bsky in batches, instead of polling
+getAuthorFeed per actor.
+
+Batches go out every JETSTREAM_BATCH_ROWS posts or JETSTREAM_FLUSH_SECONDS,
+in one transaction with the actors' high-water marks (so polling HEAD
+crawls stop at them) and the stream checkpoint (event time_us). After a
+disconnect or restart we resume a few seconds before the checkpoint;
+replayed posts are dropped by the (uri, created_at) conflict on insert.
+Rows are keyed on the event time rather than AppView's indexedAt, which
+the stream doesn't carry; insert_bsky_posts skips a uri the poller has
+already stored a few seconds apart, and the poller skips ours.
+
+JETSTREAM_URL can point at a local stand-in server for testing.
+"""
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect
+
+from config import (
+    DATABASE_URL,
+    BSKY_ACTORS,
+    BSKY_HANDLE,
+    BSKY_APP_PASSWORD,
+    JETSTREAM_URL,
+    JETSTREAM_BATCH_ROWS,
+    JETSTREAM_FLUSH_SECONDS,
+    JETSTREAM_REWIND_SECONDS,
+)
+from crawl_state import load_stream_cursor, save_stream_cursor, save_head
+from db import pooled_conn, insert_bsky_posts
+from bsky_client import newest_head
+from bsky_client_cached import get_bsky_client
+from logutil import get_logger
+import actor_cache
+import fastjson
+import seen
+import textnorm
+
+logger = get_logger("jetstream")
+
+STREAM = "jetstream"
+POST_COLLECTION = "app.bsky.feed.post"
+DENY = set(filter(None, os.getenv("BSKY_DENYLIST", "").split(",")))
+
+def subscribe_url(base: str, dids: List[str], cursor: Optional[int] = None) -> str:
+    params = [("wantedCollections", POST_COLLECTION)] + [("wantedDids", d) for d in dids]
+    if cursor:
+        params.append(("cursor", str(cursor)))
+    return base + ("&" if "?" in base else "?") + urlencode(params)
+
+def event_row(event: dict, actors_by_did: Dict[str, str]) -> Optional[dict]:
+    """posts_bsky row for a post-create event by a tracked DID, else None."""
+    if event.get("kind") != "commit":
+        return None
+    commit = event.get("commit") or {}
+    if commit.get("operation") != "create" or commit.get("collection") != POST_COLLECTION:
+        return None
+    did = event.get("did")
+    # the server filters on wantedDids too, but a stand-in may not
+    actor = actors_by_did.get(did)
+    if actor is None:
+        return None
+
+    record = commit.get("record") or {}
+    uri = f"at://{did}/{POST_COLLECTION}/{commit.get('rkey')}"
+    indexed_at = datetime.fromtimestamp(event["time_us"] / 1e6, tz=timezone.utc)
+    # shaped like a getAuthorFeed post view where it matters to readers
+    # (data->'record'->>'text', data->'embed'->'external')
+    data = {
+        "uri": uri,
+        "cid": commit.get("cid"),
+        "author": {"did": did, "handle": actor},
+        "record": record,
+        "embed": record.get("embed"),
+        "indexed_at": indexed_at.isoformat(),
+    }
+    return {
+        "actor": actor,
+        "uri": uri,
+        "created_at": indexed_at,
+        "data": data,
+        "stance": None,
+        "like_count": None,
+        "repost_count": None,
+        "has_media": bool(record.get("embed")),
+        **textnorm.bsky_columns(data),
+    }
+
+def _flush(rows: List[dict], cursor: Optional[int]) -> int:
+    by_actor: Dict[str, List[dict]] = {}
+    for r in rows:
+        by_actor.setdefault(r["actor"], []).append(r)
+    with pooled_conn(DATABASE_URL) as conn:
+        # replays after a reconnect rewind are mostly known already
+        new_rows = seen.unseen_bsky(conn, rows)
+        inserted = insert_bsky_posts(conn, new_rows, commit=False)
+        for actor, actor_rows in by_actor.items():
+            save_head(conn, actor, newest_head(actor_rows))
+        if cursor:
+            save_stream_cursor(conn, STREAM, cursor)
+        conn.commit()
+    seen.remember_bsky(new_rows)
+    return inserted
+
+def _consume(ws, actors_by_did: Dict[str, str]) -> None:
+    """Read events until the connection drops, flushing by size or age."""
+    rows: List[dict] = []
+    last_us = saved_us = None
+    last_flush = time.monotonic()
+    while True:
+        wait = max(0.0, JETSTREAM_FLUSH_SECONDS - (time.monotonic() - last_flush))
+        try:
+            event = fastjson.loads(ws.recv(timeout=wait))
+        except TimeoutError:
+            event = None
+        if event is not None:
+            last_us = event.get("time_us") or last_us
+            row = event_row(event, actors_by_did)
+            if row is not None:
+                rows.append(row)
+
+        if len(rows) >= JETSTREAM_BATCH_ROWS or time.monotonic() - last_flush >= JETSTREAM_FLUSH_SECONDS:
+            if rows or last_us != saved_us:
+                inserted = _flush(rows, last_us)
+                if rows:
+                    logger.info(f"jetstream: batch={len(rows)} inserted={inserted} cursor={last_us}")
+                saved_us = last_us
+                rows = []
+            last_flush = time.monotonic()
+
+def run() -> None:
+    actors = [a for a in BSKY_ACTORS if a not in DENY]
+    client = get_bsky_client(BSKY_HANDLE, BSKY_APP_PASSWORD)
+    backoff = 1.0
+    with pooled_conn(DATABASE_URL) as conn:
+        textnorm.ensure_schema(conn)
+    while True:
+        # re-resolve on every (re)connect so handle changes and revived actors are picked up
+        with pooled_conn(DATABASE_URL) as conn:
+            dids = actor_cache.resolve(conn, client, actors)
+            conn.commit()
+            cursor = load_stream_cursor(conn, STREAM)
+        actors_by_did = {did: actor for actor, did in dids.items() if did}
+        if cursor:
+            cursor -= int(JETSTREAM_REWIND_SECONDS * 1_000_000)
+
+        url = subscribe_url(JETSTREAM_URL, sorted(actors_by_did), cursor)
+        logger.info(f"jetstream: connecting dids={len(actors_by_did)} cursor={cursor}")
+        try:
+            with connect(url, max_size=None) as ws:
+                backoff = 1.0
+                _consume(ws, actors_by_did)
+        except (OSError, WebSocketException) as e:
+            logger.warning(f"jetstream: connection lost ({e}); reconnecting in {backoff:.0f}s")
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,186 @@
+"""
+Crawler metrics in Prometheus text format, without extra dependencies.
+
+    with metrics.timer("thread_fetch"):      # crawler_stage_seconds{stage=...}
+        ...
+    metrics.inc("crawler_http_responses_total", host="a.4cdn.org", status="200")
+
+Faktory runs jobs in child processes, so each process keeps its own
+numbers and snapshots them to METRICS_DIR (at most once a second, and at
+the end of every job). The worker's parent process serves the merged view
+on METRICS_PORT (/metrics); rows/sec is rate(crawler_rows_inserted_total).
+
+Updates are a dict lookup and a bisect under a lock, so leaving this on
+costs microseconds per HTTP request or DB batch. METRICS_PORT=0 turns it
+off entirely.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from config import METRICS_PORT, METRICS_DIR
+import fastjson
+
+ENABLED = METRICS_PORT > 0
+
+# seconds; covers a sub-ms decode up to a multi-minute board pass
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_HELP = {
+    "crawler_stage_seconds": ("histogram", "Time spent per crawl stage"),
+    "crawler_job_seconds": ("histogram", "Job run time"),
+    "crawler_job_queue_lag_seconds": ("histogram", "Time from enqueue to job start"),
+    "crawler_http_responses_total": ("counter", "HTTP responses by host and status"),
+    "crawler_rows_inserted_total": ("counter", "New rows written, by table"),
+    "crawler_rows_skipped_total": ("counter", "Rows dropped by the seen-post filter, by table"),
+    "crawler_jobs_total": ("counter", "Jobs finished, by job and outcome"),
+}
+
+# (name, sorted label items) -> float (counter) or [bucket counts..., +Inf, sum]
+_DATA: Dict[Tuple[str, tuple], object] = {}
+_LOCK = threading.Lock()
+_LAST_PERSIST = 0.0
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _LOCK:
+        _DATA[k] = _DATA.get(k, 0.0) + value
+    _maybe_persist()
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _LOCK:
+        h = _DATA.get(k)
+        if h is None:
+            h = _DATA[k] = [0] * (len(BUCKETS) + 1) + [0.0]
+        h[bisect.bisect_left(BUCKETS, seconds)] += 1
+        h[-1] += seconds
+    _maybe_persist()
+
+@contextmanager
+def timer(stage: str, **labels):
+    """Observe the block's wall time as crawler_stage_seconds{stage=...}."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("crawler_stage_seconds", time.perf_counter() - t0, stage=stage, **labels)
+
+# ---------- cross-process snapshots ----------
+
+def _snapshot_path(pid: int):
+    return METRICS_DIR / f"{pid}.json"
+
+def persist() -> None:
+    """Write this process's numbers for the serving process to pick up."""
+    global _LAST_PERSIST
+    if not ENABLED:
+        return
+    with _LOCK:
+        items = [[name, list(labels), v] for (name, labels), v in _DATA.items()]
+        _LAST_PERSIST = time.monotonic()
+    path = _snapshot_path(os.getpid())
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(fastjson.dumps(items))
+    tmp.replace(path)
+
+def _maybe_persist() -> None:
+    if time.monotonic() - _LAST_PERSIST >= 1.0:
+        try:
+            persist()
+        except OSError:
+            pass
+
+def _merged() -> Dict[Tuple[str, tuple], object]:
+    merged: Dict[Tuple[str, tuple], object] = {}
+    for path in METRICS_DIR.glob("*.json"):
+        if path.stem == str(os.getpid()):
+            continue
+        try:
+            items = fastjson.loads(path.read_bytes())
+        except (OSError, ValueError):
+            continue
+        for name, labels, v in items:
+            k = (name, tuple(tuple(kv) for kv in labels))
+            cur = merged.get(k)
+            if cur is None:
+                merged[k] = v
+            elif isinstance(v, list):
+                merged[k] = [a + b for a, b in zip(cur, v)]
+            else:
+                merged[k] = cur + v
+    with _LOCK:
+        own = dict(_DATA)
+    for k, v in own.items():
+        cur = merged.get(k)
+        if cur is None:
+            merged[k] = list(v) if isinstance(v, list) else v
+        elif isinstance(v, list):
+            merged[k] = [a + b for a, b in zip(cur, v)]
+        else:
+            merged[k] = cur + v
+    return merged
+
+def _fmt_labels(labels, extra=()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    lines = []
+    by_name: Dict[str, list] = {}
+    for (name, labels), v in sorted(_merged().items()):
+        by_name.setdefault(name, []).append((labels, v))
+    for name, series in by_name.items():
+        kind, help_text = _HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, v in series:
+            if not isinstance(v, list):
+                lines.append(f"{name}{_fmt_labels(labels)} {v}")
+                continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), v[:-1]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {v[-1]}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port: int = METRICS_PORT, host: str = "127.0.0.1") -> None:
+    """Start the /metrics endpoint on a daemon thread (call once, in the parent)."""
+    if not ENABLED:
+        return
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    # snapshots from a previous run would be counted again
+    for path in METRICS_DIR.glob("*.json"):
+        path.unlink(missing_ok=True)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
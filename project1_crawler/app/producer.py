@@ -9,17 +9,183 @@ try:
         CHAN_BOARDS as CFG_CHAN_BOARDS,
         BSKY_ACTORS as CFG_BSKY_ACTORS,
         PRODUCER_SLEEP_SECONDS as CFG_SLEEP,
+        CRAWL_ADAPTIVE as CFG_ADAPTIVE,
+        PRODUCER_TICK_SECONDS as CFG_TICK,
+        JOB_UNIQUE as CFG_UNIQUE,
+        JOB_RETRIES as CFG_RETRIES,
+        BSKY_ASYNC as CFG_BSKY_ASYNC,
+        BSKY_ACTOR_CACHE as CFG_ACTOR_CACHE,
+        ENGAGEMENT_REFRESH as CFG_ENGAGEMENT,
     )
 except Exception:
     CFG_CHAN_BOARDS = "sp,pol"
     CFG_BSKY_ACTORS = ""
     CFG_SLEEP = 60
+    CFG_ADAPTIVE = False
+    CFG_TICK = 5
+    CFG_UNIQUE = False
+    CFG_RETRIES = 5
+    CFG_BSKY_ASYNC = False
+    CFG_ACTOR_CACHE = False
+    CFG_ENGAGEMENT = False
 
 
 def _split_csv(val: str):
     return [x.strip() for x in val.split(",") if x.strip()]
 
 
+class PushError(Exception):
+    """push_batch gave up; `pushed` jobs from the front of the batch made it."""
+
+    def __init__(self, pushed, cause):
+        super().__init__(f"pushed {pushed} before failing: {cause}")
+        self.pushed = pushed
+
+
+class JobPusher:
+    """One long-lived Faktory connection for the whole producer process."""
+
+    def __init__(self):
+        self._client = None
+
+    def close(self):
+        if self._client is not None:
+            try:
+                self._client.disconnect()
+            except Exception:
+                pass
+        self._client = None
+
+    def push_batch(self, jobs):
+        """
+        Push [(jobtype, args), ...] back-to-back over the open connection.
+        On a broken connection, reconnect once and resume where it stopped;
+        if that fails too, raise PushError with how many got through.
+        """
+        pushed = 0
+        for attempt in range(2):
+            try:
+                if self._client is None:
+                    client = Client()
+                    client.connect()
+                    self._client = client
+                for jobtype, args in jobs[pushed:]:
+                    # inflight.fail counts on this retry budget
+                    self._client.queue(jobtype, args=args, retry=CFG_RETRIES)
+                    pushed += 1
+                return pushed
+            except Exception as e:
+                self.close()
+                if attempt:
+                    raise PushError(pushed, e) from e
+        return pushed
+
+
+def _build_jobs(chan_boards, bsky_actors):
+    # keys match scheduler.source_key / inflight keys used by the worker
+    jobs = {}
+    for board in chan_boards:
+        jobs[f"board:{board}"] = ("crawl_board", [board])
+    if CFG_ENGAGEMENT and bsky_actors:
+        # cheap when nothing is due: the job picks posts by age tier itself
+        jobs["bsky:engagement"] = ("refresh_bsky_engagement", [])
+    if CFG_BSKY_ASYNC and bsky_actors:
+        # one async job covers every actor (the worker reads BSKY_ACTORS itself)
+        jobs["bsky:all"] = ("crawl_bsky_all", [])
+        return jobs
+    for actor in bsky_actors:
+        jobs[f"actor:{actor}"] = ("crawl_bsky_actor", [actor])
+    return jobs
+
+
+def _claim_unique(keys):
+    """
+    Drop keys that still have a job queued or running (see inflight.py).
+    Returns (keys to push, whether they were claimed).
+    """
+    if not CFG_UNIQUE or not keys:
+        return keys, False
+    try:
+        import inflight
+        from db import pooled_conn
+        with pooled_conn() as conn:
+            claimed = inflight.claim(conn, keys)
+            conn.commit()
+        return claimed, True
+    except Exception as e:
+        # better a duplicate job than a stalled crawler
+        print("PRODUCER: in-flight check failed, pushing all:", e, flush=True)
+        return keys, False
+
+
+def _release_unique(keys):
+    """Give back claims for jobs that never reached Faktory, so the next pass can push them."""
+    try:
+        import inflight
+        from db import pooled_conn
+        with pooled_conn() as conn:
+            for key in keys:
+                inflight.release(conn, key)
+            conn.commit()
+    except Exception as e:
+        # they expire after JOB_INFLIGHT_TTL_SECONDS anyway
+        print("PRODUCER: releasing unpushed claims failed:", e, flush=True)
+
+
+def _drop_dead(keys):
+    """Drop actor keys that actor_cache has marked dead and not yet due a re-check."""
+    actors = [k.split(":", 1)[1] for k in keys if k.startswith("actor:")]
+    if not CFG_ACTOR_CACHE or not actors:
+        return keys
+    try:
+        import actor_cache
+        from db import pooled_conn
+        with pooled_conn() as conn:
+            live = set(actor_cache.live_actors(conn, actors))
+            conn.commit()
+    except Exception as e:
+        print("PRODUCER: actor cache check failed, pushing all:", e, flush=True)
+        return keys
+    return [k for k in keys if not k.startswith("actor:") or k.split(":", 1)[1] in live]
+
+
+def _push(pusher, jobs, keys):
+    """Claim and push; returns the keys that were enqueued."""
+    keys, claimed = _claim_unique(_drop_dead(keys))
+    if not keys:
+        return keys
+    try:
+        pusher.push_batch([jobs[k] for k in keys])
+    except PushError as e:
+        print("PRODUCER: push failed, retrying next pass:", e, flush=True)
+        if claimed:
+            _release_unique(keys[e.pushed:])
+        return keys[:e.pushed]
+    return keys
+
+
+def run_adaptive(jobs, pusher, tick_seconds):
+    """
+    Enqueue each board/actor only when its adaptive next-poll time is due.
+    Workers report new-post counts back through scheduler.record_poll.
+    """
+    from db import pooled_conn
+    from scheduler import claim_due
+
+    sources = list(jobs)
+    print("PRODUCER: adaptive sources=", sources, "tick=", tick_seconds, flush=True)
+    while True:
+        with pooled_conn() as conn:
+            due = claim_due(conn, sources)
+            conn.commit()
+
+        if due:
+            pushed = _push(pusher, jobs, due)
+            print("PRODUCER: due=", len(due), "enqueued=", len(pushed), flush=True)
+
+        time.sleep(tick_seconds)
+
+
 def main():
     # boards
     env_boards = os.getenv("CHAN_BOARDS")
@@ -37,17 +203,21 @@ def main():
 
     sleep_seconds = int(os.getenv("PRODUCER_SLEEP_SECONDS", str(CFG_SLEEP)))
 
-    while True:
-        print("PRODUCER: boards=", chan_boards, "actors=", bsky_actors, "sleep=", sleep_seconds, flush=True)
-        # THIS is the faktory client your worker is using too
-        with Client() as client:
-            for board in chan_boards:
-                client.queue("crawl_board", args=[board])
-
-            for actor in bsky_actors:
-                client.queue("crawl_bsky_actor", args=[actor])
+    jobs = _build_jobs(chan_boards, bsky_actors)
+    # THIS is the faktory client your worker is using too, kept open across loops
+    pusher = JobPusher()
+    try:
+        if CFG_ADAPTIVE:
+            run_adaptive(jobs, pusher, CFG_TICK)
+            return
 
-        time.sleep(sleep_seconds)
+        while True:
+            print("PRODUCER: boards=", chan_boards, "actors=", bsky_actors, "sleep=", sleep_seconds, flush=True)
+            pushed = _push(pusher, jobs, list(jobs))
+            print("PRODUCER: enqueued", len(pushed), "of", len(jobs), flush=True)
+            time.sleep(sleep_seconds)
+    finally:
+        pusher.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() blocks until a token is available. rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# one bucket per host, shared by every thread in the process
+_BUCKETS: Dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def bucket_for(url: str, rate: float, burst: float = 1.0) -> TokenBucket:
+    host = urlsplit(url).netloc
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(host)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+            _BUCKETS[host] = bucket
+        return bucket
+
+
+class AsyncTokenBucket:
+    """
+    asyncio token bucket shared by every task in one event loop. penalize()
+    blocks all callers until a server-imposed cool-down (429) has passed.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def penalize(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens go out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]], default: float = 5.0) -> float:
+    """Cool-down from Retry-After or RateLimit-Reset (epoch seconds) headers."""
+    h = {str(k).lower(): v for k, v in (headers or {}).items()}
+    try:
+        if "retry-after" in h:
+            return max(float(h["retry-after"]), 1.0)
+        if "ratelimit-reset" in h:
+            return max(float(h["ratelimit-reset"]) - time.time(), 1.0)
+    except (TypeError, ValueError):
+        pass
+    return default
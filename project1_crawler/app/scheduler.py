@@ -0,0 +1,128 @@
+"""
+Adaptive poll scheduling: one row per source (board or actor) holding an
+EWMA of new posts per second, fed by worker job results. The next poll
+is due once we'd expect about CRAWL_TARGET_NEW_PER_POLL new posts,
+clamped to [CRAWL_MIN_INTERVAL_SECONDS, CRAWL_MAX_INTERVAL_SECONDS].
+"""
+from typing import List
+
+from config import (
+    CRAWL_EWMA_ALPHA,
+    CRAWL_TARGET_NEW_PER_POLL,
+    CRAWL_MIN_INTERVAL_SECONDS,
+    CRAWL_MAX_INTERVAL_SECONDS,
+)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_schedule (
+    source      text             PRIMARY KEY,
+    ewma_rate   double precision NOT NULL DEFAULT 0,
+    interval_s  double precision,
+    last_polled timestamptz,
+    next_due    timestamptz      NOT NULL DEFAULT now()
+);
+"""
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def source_key(kind: str, name: str) -> str:
+    return f"{kind}:{name}"
+
+def next_interval(rate: float) -> float:
+    """Seconds until the next poll for a source producing `rate` posts/sec."""
+    if rate <= 0:
+        return float(CRAWL_MAX_INTERVAL_SECONDS)
+    interval = CRAWL_TARGET_NEW_PER_POLL / rate
+    return max(float(CRAWL_MIN_INTERVAL_SECONDS), min(float(CRAWL_MAX_INTERVAL_SECONDS), interval))
+
+def record_poll(conn, source: str, new_posts: int) -> float:
+    """
+    Fold one poll's result into the source's EWMA and schedule its next poll.
+    Runs on conn without committing. Returns the new interval in seconds.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT ewma_rate, EXTRACT(EPOCH FROM now() - last_polled) "
+        "FROM crawl_schedule WHERE source = %s FOR UPDATE",
+        (source,),
+    )
+    row = cur.fetchone()
+    ewma, elapsed = (row[0], row[1]) if row else (0.0, None)
+    if elapsed and elapsed > 0:
+        rate = new_posts / float(elapsed)
+        ewma = CRAWL_EWMA_ALPHA * rate + (1 - CRAWL_EWMA_ALPHA) * ewma
+    # first poll of a source: its count is backlog, not velocity, so keep
+    # the EWMA and come back at the minimum interval to get a real sample
+    interval = next_interval(ewma) if elapsed else float(CRAWL_MIN_INTERVAL_SECONDS)
+
+    cur.execute(
+        """
+        INSERT INTO crawl_schedule (source, ewma_rate, interval_s, last_polled, next_due)
+        VALUES (%s, %s, %s, now(), now() + make_interval(secs => %s))
+        ON CONFLICT (source) DO UPDATE SET
+            ewma_rate   = EXCLUDED.ewma_rate,
+            interval_s  = EXCLUDED.interval_s,
+            last_polled = EXCLUDED.last_polled,
+            next_due    = EXCLUDED.next_due
+        """,
+        (source, ewma, interval, interval),
+    )
+    cur.close()
+    return interval
+
+def retry_soon(conn, sources: List[str]) -> None:
+    """
+    A poll failed (or its job never got queued): bring the claim_due lease
+    in to the min interval, leaving the EWMA alone, since a failure says
+    nothing about how busy the source is. No commit.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE crawl_schedule
+        SET next_due = LEAST(next_due, now() + make_interval(secs => %s))
+        WHERE source = ANY(%s)
+        """,
+        (float(CRAWL_MIN_INTERVAL_SECONDS), list(sources)),
+    )
+    cur.close()
+
+def claim_due(conn, sources: List[str]) -> List[str]:
+    """
+    Return the sources that are due now and push their next_due out to the
+    max interval, so a job that gets lost still retries eventually (the
+    worker's record_poll sets the real next poll, retry_soon a failed
+    one's). New sources are due at once. Atomic, so several producers can
+    share the table.
+    """
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO crawl_schedule (source) SELECT unnest(%s::text[]) "
+        "ON CONFLICT (source) DO NOTHING",
+        (sources,),
+    )
+    cur.execute(
+        """
+        UPDATE crawl_schedule
+        SET next_due = now() + make_interval(secs => %s)
+        WHERE source = ANY(%s) AND next_due <= now()
+        RETURNING source
+        """,
+        (float(CRAWL_MAX_INTERVAL_SECONDS), sources),
+    )
+    due = [r[0] for r in cur.fetchall()]
+    cur.close()
+    return due
@@ -0,0 +1,111 @@
+"""
+Seen-post filter: drop rows we already stored before they reach
+insert_4chan_posts / insert_bsky_posts, instead of shipping them to
+Postgres for ON CONFLICT DO NOTHING to throw away.
+
+Each process keeps a bounded LRU of keys, (board, post_number) for 4chan
+and uri for Bluesky, one per table. It is warmed on first use from the
+last SEEN_WARM_HOURS of that table (newest SEEN_CACHE_SIZE rows), then
+fed by remember_*() once a transaction that wrote rows has committed.
+Keys only ever come from committed rows, so a hit means the row is
+stored: the filter never drops a new post. A miss is just an insert that
+ON CONFLICT handles as before.
+
+    rows = seen.unseen_4chan(conn, rows)
+    insert_4chan_posts(conn, rows, commit=False); conn.commit()
+    seen.remember_4chan(rows)
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+from config import SEEN_FILTER, SEEN_CACHE_SIZE, SEEN_WARM_HOURS
+from logutil import get_logger
+import metrics
+
+logger = get_logger("seen")
+
+class _LRU:
+    def __init__(self, table: str, key: Callable[[dict], Hashable], warm_sql: str):
+        self.table = table
+        self.key = key
+        self.warm_sql = warm_sql
+        self.keys: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.warm = False
+        self.lock = threading.Lock()
+
+    def _warm(self, conn) -> None:
+        # read-only, inside the caller's transaction; no commit
+        cur = conn.cursor()
+        cur.execute(self.warm_sql, (SEEN_WARM_HOURS, SEEN_CACHE_SIZE))
+        keys = cur.fetchall()
+        cur.close()
+        with self.lock:
+            # newest first from the query; oldest must end up first to be evicted first
+            for k in reversed(keys):
+                self.keys[k[0] if len(k) == 1 else tuple(k)] = None
+            self.warm = True
+        logger.info(f"seen: warmed {self.table} keys={len(keys)}")
+
+    def unseen(self, conn, rows: List[dict]) -> List[dict]:
+        if not SEEN_FILTER or not rows:
+            return rows
+        if not self.warm:
+            self._warm(conn)
+        out = []
+        with self.lock:
+            for r in rows:
+                k = self.key(r)
+                if k in self.keys:
+                    self.keys.move_to_end(k)
+                else:
+                    out.append(r)
+        if len(out) != len(rows):
+            metrics.inc("crawler_rows_skipped_total", len(rows) - len(out), table=self.table)
+        return out
+
+    def remember(self, rows: List[dict]) -> None:
+        if not SEEN_FILTER or not rows:
+            return
+        with self.lock:
+            for r in rows:
+                k = self.key(r)
+                self.keys[k] = None
+                self.keys.move_to_end(k)
+            while len(self.keys) > SEEN_CACHE_SIZE:
+                self.keys.popitem(last=False)
+
+_CHAN = _LRU(
+    "posts_4chan",
+    lambda r: (r["board_name"], r["post_number"]),
+    """
+    SELECT board_name, post_number FROM posts_4chan
+    WHERE created_at > now() - make_interval(hours => %s)
+    ORDER BY created_at DESC LIMIT %s
+    """,
+)
+_BSKY = _LRU(
+    "posts_bsky",
+    lambda r: r["uri"],
+    """
+    SELECT uri FROM posts_bsky
+    WHERE created_at > now() - make_interval(hours => %s)
+    ORDER BY created_at DESC LIMIT %s
+    """,
+)
+
+def unseen_4chan(conn, rows: List[dict]) -> List[dict]:
+    """rows whose (board, post_number) isn't known to be stored. No commit."""
+    return _CHAN.unseen(conn, rows)
+
+def unseen_bsky(conn, rows: List[dict]) -> List[dict]:
+    """rows whose uri isn't known to be stored. No commit."""
+    return _BSKY.unseen(conn, rows)
+
+def remember_4chan(rows: List[dict]) -> None:
+    """Call after the commit that stored rows."""
+    _CHAN.remember(rows)
+
+def remember_bsky(rows: List[dict]) -> None:
+    """Call after the commit that stored rows."""
+    _BSKY.remember(rows)
@@ -0,0 +1,129 @@
+"""
+Shared Bluesky session store, so every worker process (on any host) reuses
+one login instead of calling createSession on each start.
+
+BSKY_SESSION_STORE=db (default) keeps the exported session string in the
+bsky_session table and serializes logins with a Postgres advisory lock;
+=file keeps it in state/bsky_session.json under an flock (one host only).
+Whoever holds the lock logs in or refreshes and saves; everyone else
+waits and then picks up the saved session.
+"""
+import base64
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import BSKY_SESSION_STORE, BSKY_SESSION_PATH
+from state import load_json
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS bsky_session (
+    handle     text        PRIMARY KEY,
+    session    text        NOT NULL,
+    access_exp bigint      NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+def access_exp(session: str) -> int:
+    """Expiry (epoch seconds) of the access JWT inside an exported session string, 0 if unknown."""
+    for part in session.split(":::"):
+        segs = part.split(".")
+        if len(segs) != 3 or not part.startswith("ey"):
+            continue
+        try:
+            payload = segs[1] + "=" * (-len(segs[1]) % 4)
+            return int(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except Exception:
+            return 0
+    return 0
+
+class _DbStore:
+    def __init__(self, conn, handle: str):
+        self.conn = conn
+        self.handle = handle
+
+    def load(self) -> Optional[str]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT session FROM bsky_session WHERE handle = %s", (self.handle,))
+        row = cur.fetchone()
+        cur.close()
+        return row[0] if row else None
+
+    def save(self, session: str) -> None:
+        # never replace a session with an older one (another process may have refreshed)
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO bsky_session (handle, session, access_exp) VALUES (%s, %s, %s)
+            ON CONFLICT (handle) DO UPDATE SET
+                session = EXCLUDED.session, access_exp = EXCLUDED.access_exp, updated_at = now()
+            WHERE bsky_session.access_exp <= EXCLUDED.access_exp
+            """,
+            (self.handle, session, access_exp(session)),
+        )
+        cur.close()
+
+class _FileStore:
+    def __init__(self, handle: str):
+        self.handle = handle
+
+    def load(self) -> Optional[str]:
+        return load_json(BSKY_SESSION_PATH).get(self.handle)
+
+    def save(self, session: str) -> None:
+        sessions = load_json(BSKY_SESSION_PATH)
+        old = sessions.get(self.handle)
+        if old and access_exp(old) > access_exp(session):
+            return
+        sessions[self.handle] = session
+        # holds live tokens: owner-only, written via tmp + rename
+        tmp = BSKY_SESSION_PATH.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(sessions, f, separators=(",", ":"))
+        tmp.replace(BSKY_SESSION_PATH)
+
+@contextmanager
+def locked(handle: str) -> Iterator[object]:
+    """
+    Exclusive access to handle's stored session across processes. Yields a
+    store with load() -> session string or None, and save(session).
+    """
+    if BSKY_SESSION_STORE == "file":
+        with open(BSKY_SESSION_PATH.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield _FileStore(handle)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return
+
+    from db import pooled_conn
+    with pooled_conn() as conn:
+        ensure_schema(conn)
+        cur = conn.cursor()
+        # held until commit/rollback; blocks other processes mid-login
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", ("bsky-session:" + handle,))
+        cur.close()
+        yield _DbStore(conn, handle)
+        conn.commit()
+
+def save(handle: str, session: str) -> None:
+    """Take the lock just to store a session (e.g. one the client refreshed on its own)."""
+    with locked(handle) as store:
+        store.save(session)
@@ -14,5 +14,6 @@ def load_json(path: Path) -> Dict[str, Any]:
 def save_json(path: Path, data: Dict[str, Any]) -> None:
     tmp = path.with_suffix('.tmp')
     with tmp.open('w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False)
+        # compact: no whitespace between tokens
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
     tmp.replace(path)
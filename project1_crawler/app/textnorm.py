@@ -0,0 +1,133 @@
+"""
+Ingest-time text normalization: the plain text of a post, what it quotes
+or links to, its length and a hash, stored as typed columns so analysis
+code reads `text_plain` instead of parsing 4chan HTML or Bluesky JSON.
+
+  text_plain   4chan: `com` with tags stripped, <br> as newlines, entities
+               decoded and >>123 quote markers removed (they're in
+               quote_links). Bluesky: the record text, then the link card
+               title and description when there is one.
+  quote_links  4chan: post numbers quoted (bigint[]). Bluesky: quoted post
+               URIs, link card and link facet URLs (text[]).
+  char_count, word_count
+  text_hash    64-bit blake2b of the lowercased, whitespace-collapsed text
+               (NULL when there's no text); equal hashes = same text.
+
+Rows built by the crawler carry these already; backfill_text.py fills in
+rows stored before the columns existed.
+"""
+import hashlib
+import html
+import re
+from typing import List, Optional, Tuple
+
+SCHEMA_SQL = """
+ALTER TABLE posts_4chan
+    ADD COLUMN IF NOT EXISTS text_plain  text,
+    ADD COLUMN IF NOT EXISTS quote_links bigint[],
+    ADD COLUMN IF NOT EXISTS char_count  integer,
+    ADD COLUMN IF NOT EXISTS word_count  integer,
+    ADD COLUMN IF NOT EXISTS text_hash   bigint;
+ALTER TABLE posts_bsky
+    ADD COLUMN IF NOT EXISTS text_plain  text,
+    ADD COLUMN IF NOT EXISTS quote_links text[],
+    ADD COLUMN IF NOT EXISTS char_count  integer,
+    ADD COLUMN IF NOT EXISTS word_count  integer,
+    ADD COLUMN IF NOT EXISTS text_hash   bigint;
+"""
+
+COLUMNS = ("text_plain", "quote_links", "char_count", "word_count", "text_hash")
+
+_SCHEMA_READY = False
+
+def ensure_schema(conn) -> None:
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    cur = conn.cursor()
+    cur.execute(SCHEMA_SQL)
+    conn.commit()
+    cur.close()
+    _SCHEMA_READY = True
+
+_BR = re.compile(r"<br\s*/?>", re.I)
+_TAG = re.compile(r"<[^>]+>")
+# raw com has &gt;&gt;123 (inside a quotelink anchor or bare); cross-board >>>/b/123 isn't a post number
+_QUOTE = re.compile(r"(?<!&gt;)&gt;&gt;(\d+)")
+_QUOTE_PLAIN = re.compile(r"(?<!>)>>\d+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_WS = re.compile(r"\s+")
+
+def text_hash(text: str) -> Optional[int]:
+    norm = _WS.sub(" ", text).strip().lower()
+    if not norm:
+        return None
+    digest = hashlib.blake2b(norm.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def _columns(text: str, links: list) -> dict:
+    return {
+        "text_plain": text,
+        "quote_links": links,
+        "char_count": len(text),
+        "word_count": len(text.split()),
+        "text_hash": text_hash(text),
+    }
+
+def chan_text(com: Optional[str]) -> Tuple[str, List[int]]:
+    """(plain text, quoted post numbers) for a 4chan `com` HTML fragment."""
+    if not com:
+        return "", []
+    quotes = list(dict.fromkeys(int(n) for n in _QUOTE.findall(com)))
+    text = html.unescape(_TAG.sub("", _BR.sub("\n", com)))
+    text = _QUOTE_PLAIN.sub("", text)
+    text = _BLANK_LINES.sub("\n\n", "\n".join(line.strip() for line in text.split("\n")))
+    return text.strip(), quotes
+
+def chan_columns(post: dict) -> dict:
+    """Normalized-text columns for one 4chan post (the thread JSON dict)."""
+    return _columns(*chan_text(post.get("com")))
+
+def _get(obj, *path):
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+def bsky_text(data: Optional[dict]) -> Tuple[str, List[str]]:
+    """
+    (plain text, linked URIs) from a posts_bsky `data` dict. Works on the
+    lean projection, a full model_dump() and Jetstream records alike.
+    """
+    record = _get(data, "record") or {}
+    parts = [str(record.get("text") or "").strip()]
+    links: List[str] = []
+
+    # the card as shown (post view) or as written (record)
+    external = _get(data, "embed", "external") or _get(record, "embed", "external") \
+        or _get(record, "embed", "media", "external")
+    if isinstance(external, dict):
+        for key in ("title", "description"):
+            if external.get(key):
+                parts.append(str(external[key]).strip())
+        if external.get("uri"):
+            links.append(external["uri"])
+
+    # quote posts: embed.record, or embed.record.record with media
+    quoted = _get(record, "embed", "record")
+    if isinstance(quoted, dict) and isinstance(quoted.get("record"), dict):
+        quoted = quoted["record"]
+    if isinstance(quoted, dict) and quoted.get("uri"):
+        links.append(quoted["uri"])
+
+    for facet in record.get("facets") or []:
+        for feature in _get(facet, "features") or []:
+            if isinstance(feature, dict) and feature.get("uri"):
+                links.append(feature["uri"])
+
+    return "\n".join(p for p in parts if p), list(dict.fromkeys(links))
+
+def bsky_columns(data: Optional[dict]) -> dict:
+    """Normalized-text columns for one posts_bsky `data` dict."""
+    return _columns(*bsky_text(data))
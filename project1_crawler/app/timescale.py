@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+TimescaleDB layout for the post tables, applied idempotently:
+
+  - posts_4chan / posts_bsky (and bsky_engagement, if present) become
+    hypertables on their time column, TSDB_CHUNK_INTERVAL per chunk.
+    Existing rows are moved into chunks, which locks the table while it
+    runs, so do the first migration with the crawler stopped.
+  - Columnar compression segmented by board_name / actor (queries filter
+    on those, and a segment's rows compress together), newest first, with
+    a policy compressing chunks older than TSDB_COMPRESS_AFTER.
+    bsky_engagement has one row per uri per capture, so it isn't segmented
+    (segments that small don't compress); uri leads its order instead.
+  - A retention policy dropping chunks older than TSDB_RETENTION, when
+    that's set.
+  - The composite indexes the dashboard queries use.
+
+Policies are only added where missing, so re-runs leave the existing
+jobs (and their schedules) alone; to change an interval, drop the policy
+with remove_compression_policy / remove_retention_policy and re-run.
+Compression settings are only set while the table has none; changing
+segmentby later needs its chunks decompressed first.
+
+Run backfill_text.py before the first compression pass: updates to
+compressed chunks work but decompress them.
+
+    python3 timescale.py            # migrate
+    python3 timescale_report.py     # sizes and compression ratios
+"""
+from typing import List, Optional
+
+from config import (
+    DATABASE_URL,
+    TSDB_CHUNK_INTERVAL,
+    TSDB_COMPRESS_AFTER,
+    TSDB_RETENTION,
+)
+from db import get_conn
+from logutil import get_logger
+
+logger = get_logger("timescale")
+
+# (table, time column, compress_segmentby, compress_orderby)
+HYPERTABLES = (
+    ("posts_4chan", "created_at", "board_name", "created_at DESC"),
+    ("posts_bsky", "created_at", "actor", "created_at DESC"),
+    ("bsky_engagement", "captured_at", "", "uri, captured_at DESC"),
+)
+
+# (name, table, definition); hypertables also get a default (time DESC) index
+INDEXES = (
+    # per-board counts, MAX(created_at) and time-range scans
+    ("posts_4chan_board_created_idx", "posts_4chan", "(board_name, created_at DESC)"),
+    # thread sizes per board (media engagement CTE), index-only
+    ("posts_4chan_board_thread_idx", "posts_4chan", "(board_name, thread_number) INCLUDE (has_media)"),
+    # per-actor ranges (heads, backfill, per-actor charts)
+    ("posts_bsky_actor_created_idx", "posts_bsky", "(actor, created_at DESC)"),
+    # media vs text engagement averages, index-only
+    ("posts_bsky_media_likes_idx", "posts_bsky",
+     "(has_media) INCLUDE (like_count, repost_count) WHERE like_count IS NOT NULL"),
+)
+
+_LOCK_KEY = "timescale_migrate"
+
+def existing_tables(conn, names: List[str]) -> List[str]:
+    """The names that exist as tables. No commit."""
+    cur = conn.cursor()
+    cur.execute("SELECT t FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL", (names,))
+    found = {r[0] for r in cur.fetchall()}
+    cur.close()
+    return [n for n in names if n in found]
+
+def _hypertable_info(conn, table: str) -> Optional[tuple]:
+    """(num_chunks, compression_enabled) if `table` is a hypertable, else None."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT num_chunks, compression_enabled FROM timescaledb_information.hypertables
+        WHERE hypertable_name = %s AND hypertable_schema = current_schema()
+        """,
+        (table,),
+    )
+    row = cur.fetchone()
+    cur.close()
+    return row
+
+def is_hypertable(conn, table: str) -> bool:
+    """Whether `table` is a hypertable (False without the extension). No commit."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+    installed = cur.fetchone() is not None
+    cur.close()
+    return installed and _hypertable_info(conn, table) is not None
+
+def make_hypertable(conn, table: str, time_col: str) -> None:
+    info = _hypertable_info(conn, table)
+    cur = conn.cursor()
+    if info is None:
+        logger.info(f"timescale: {table} -> hypertable on {time_col} (moving existing rows)")
+        cur.execute(
+            "SELECT create_hypertable(%s::regclass, %s::name, chunk_time_interval => %s::interval, "
+            "migrate_data => true, if_not_exists => true)",
+            (table, time_col, TSDB_CHUNK_INTERVAL),
+        )
+    else:
+        # only affects chunks created from now on
+        cur.execute("SELECT set_chunk_time_interval(%s::regclass, %s::interval)",
+                    (table, TSDB_CHUNK_INTERVAL))
+    cur.close()
+
+def enable_compression(conn, table: str, segmentby: str, orderby: str) -> None:
+    info = _hypertable_info(conn, table)
+    if info is not None and info[1]:
+        return
+    cur = conn.cursor()
+    cur.execute(
+        f"ALTER TABLE {table} SET (timescaledb.compress, "
+        f"timescaledb.compress_segmentby = '{segmentby}', "
+        f"timescaledb.compress_orderby = '{orderby}')"
+    )
+    cur.close()
+    logger.info(f"timescale: {table} compression on, segmentby={segmentby or 'none'} orderby={orderby}")
+
+def set_policies(conn, table: str) -> None:
+    cur = conn.cursor()
+    cur.execute("SELECT add_compression_policy(%s::regclass, compress_after => %s::interval, "
+                "if_not_exists => true)", (table, TSDB_COMPRESS_AFTER))
+    if TSDB_RETENTION:
+        cur.execute("SELECT add_retention_policy(%s::regclass, drop_after => %s::interval, "
+                    "if_not_exists => true)", (table, TSDB_RETENTION))
+    cur.close()
+
+def create_indexes(conn, tables: List[str]) -> None:
+    cur = conn.cursor()
+    for name, table, definition in INDEXES:
+        if table in tables:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}")
+    cur.close()
+
+def migrate(dsn: str = DATABASE_URL) -> None:
+    """Apply the whole layout; one commit per table, serialized across hosts."""
+    conn = get_conn(dsn)
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (_LOCK_KEY,))
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+        conn.commit()
+
+        tables = existing_tables(conn, [t for t, *_ in HYPERTABLES])
+        for table, time_col, segmentby, orderby in HYPERTABLES:
+            if table not in tables:
+                logger.info(f"timescale: {table} doesn't exist yet, skipped")
+                continue
+            make_hypertable(conn, table, time_col)
+            enable_compression(conn, table, segmentby, orderby)
+            set_policies(conn, table)
+            conn.commit()
+
+        create_indexes(conn, tables)
+        conn.commit()
+        logger.info(f"timescale: done tables={tables} chunk={TSDB_CHUNK_INTERVAL} "
+                    f"compress_after={TSDB_COMPRESS_AFTER} retention={TSDB_RETENTION or 'none'}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (_LOCK_KEY,))
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Sizes of the post tables: rows (estimated), table/index/toast bytes,
+chunks compressed and the compression ratio per hypertable; --chunks adds
+one line per chunk. Plain (not yet migrated) tables are reported too.
+
+    python3 timescale_report.py
+    python3 timescale_report.py --chunks --table posts_4chan
+"""
+import argparse
+
+from config import DATABASE_URL
+from db import get_conn
+from timescale import HYPERTABLES, existing_tables
+
+def _mb(n) -> str:
+    return "-" if n is None else f"{n / 1024 / 1024:,.1f} MB"
+
+def _ratio(before, after) -> str:
+    return f"x{before / after:.1f}" if before and after else "-"
+
+def table_summary(conn, table: str) -> dict:
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT num_chunks, compression_enabled FROM timescaledb_information.hypertables
+        WHERE hypertable_name = %s AND hypertable_schema = current_schema()
+        """,
+        (table,),
+    )
+    info = cur.fetchone()
+    if info is None:
+        cur.execute(
+            "SELECT reltuples::bigint, pg_table_size(oid), pg_indexes_size(oid), pg_total_relation_size(oid) "
+            "FROM pg_class WHERE oid = %s::regclass",
+            (table,),
+        )
+        rows, table_b, index_b, total_b = cur.fetchone()
+        cur.close()
+        return {"table": table, "hypertable": False, "rows": rows, "table_bytes": table_b,
+                "index_bytes": index_b, "total_bytes": total_b}
+
+    out = {"table": table, "hypertable": True, "chunks": info[0], "compression": info[1]}
+    cur.execute("SELECT approximate_row_count(%s::regclass)", (table,))
+    out["rows"] = cur.fetchone()[0]
+    cur.execute(
+        "SELECT sum(table_bytes), sum(index_bytes), sum(toast_bytes), sum(total_bytes) "
+        "FROM hypertable_detailed_size(%s::regclass)",
+        (table,),
+    )
+    out["table_bytes"], out["index_bytes"], out["toast_bytes"], out["total_bytes"] = cur.fetchone()
+    cur.execute(
+        "SELECT sum(number_compressed_chunks), sum(before_compression_total_bytes), "
+        "sum(after_compression_total_bytes) FROM hypertable_compression_stats(%s::regclass)",
+        (table,),
+    )
+    out["compressed_chunks"], out["before_bytes"], out["after_bytes"] = cur.fetchone()
+    cur.close()
+    return out
+
+def chunk_rows(conn, table: str) -> list:
+    """(chunk, range_start, range_end, compressed, total_bytes, before, after), oldest first."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT c.chunk_name, c.range_start, c.range_end, c.is_compressed,
+               s.total_bytes, z.before_compression_total_bytes, z.after_compression_total_bytes
+        FROM timescaledb_information.chunks c
+        LEFT JOIN chunks_detailed_size(%s::regclass) s
+               ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+        LEFT JOIN chunk_compression_stats(%s::regclass) z
+               ON z.chunk_schema = c.chunk_schema AND z.chunk_name = c.chunk_name
+        WHERE c.hypertable_name = %s AND c.hypertable_schema = current_schema()
+        ORDER BY c.range_start
+        """,
+        (table, table, table),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--table", action="append", help="default: every managed table that exists")
+    ap.add_argument("--chunks", action="store_true", help="also list every chunk")
+    ap.add_argument("--dsn", default=DATABASE_URL)
+    args = ap.parse_args()
+
+    conn = get_conn(args.dsn)
+    try:
+        tables = existing_tables(conn, args.table or [t for t, *_ in HYPERTABLES])
+        for table in tables:
+            s = table_summary(conn, table)
+            line = (f"{table:16s} rows~{s['rows'] or 0:>12,} total={_mb(s['total_bytes'])} "
+                    f"table={_mb(s['table_bytes'])} index={_mb(s['index_bytes'])}")
+            if not s["hypertable"]:
+                print(line + "  (plain table: run timescale.py)")
+                continue
+            print(line + f" toast={_mb(s['toast_bytes'])}")
+            print(f"{'':16s} chunks={s['chunks']} compressed={s['compressed_chunks'] or 0} "
+                  f"before={_mb(s['before_bytes'])} after={_mb(s['after_bytes'])} "
+                  f"ratio={_ratio(s['before_bytes'], s['after_bytes'])}"
+                  + ("" if s["compression"] else "  (compression off)"))
+            if args.chunks:
+                for name, start, end, compressed, total, before, after in chunk_rows(conn, table):
+                    print(f"  {name:28s} {start:%Y-%m-%d %H:%M} .. {end:%Y-%m-%d %H:%M} "
+                          f"{'compressed' if compressed else 'plain':10s} {_mb(total):>12s} "
+                          f"ratio={_ratio(before, after)}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
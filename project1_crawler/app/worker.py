@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import functools
 import os
+import time
 DENY = set(filter(None, os.getenv("BSKY_DENYLIST","").split(",")))
 from pathlib import Path
 
@@ -21,28 +23,49 @@ if load_dotenv is not None:
             load_dotenv(p, override=True)
 
 # now import the real config (this will now see your NEW BSKY_ACTORS)
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from faktory import Worker
+from faktory import Client, Worker
 from logutil import get_logger
 from config import (
     DATABASE_URL,
     FAKTORY_URL,
-    CHAN_LAST_SEEN_PATH,
-    BSKY_CURSORS_PATH,
     BSKY_HANDLE,
     BSKY_APP_PASSWORD,
     BSKY_ACTORS,
     BSKY_HEAD_PAGES,
     BSKY_BACKFILL_PAGES,
     BSKY_MAX_BACKFILL_HOURS,
+    CHAN_FETCH_CONCURRENCY,
+    CHAN_CATALOG_DIFF,
+    CHAN_TAIL_MIN_REPLIES,
+    CHAN_FANOUT,
+    CHAN_FANOUT_QUEUE,
+    CRAWL_STATE_BACKEND,
+    CRAWL_ADAPTIVE,
+    JOB_UNIQUE,
+    JOB_RETRIES,
+    BSKY_HEAD_PROBE_LIMIT,
+    BSKY_ACTOR_CACHE,
 )
-from state import load_json, save_json
-from db import get_conn, insert_4chan_posts, insert_bsky_posts
-from chan_client import get_catalog, get_thread
+from crawl_state import (
+    BoardState, ensure_schema, try_lock_thread,
+    load_cursor, save_cursor, load_heads, save_head,
+)
+from db import get_conn, pooled_conn, insert_4chan_posts, insert_bsky_posts
+from scheduler import record_poll, retry_soon, source_key
+import inflight
+import actor_cache
+import engagement
+import seen
+import textnorm
+from writebuf import WriteBuffer
+import metrics
+from chan_client import get_catalog, get_thread, get_thread_tail, tail_covers, forget, get_cache_stats
 from bsky_client_cached import get_bsky_client
-from bsky_client import get_author_feed, as_primitive
+from bsky_client import get_author_feed, post_row, head_rows, newest_head
 
 try:
     from atproto_client.exceptions import RequestException
@@ -55,11 +78,12 @@ logger = get_logger("worker")
 if FAKTORY_URL and not os.getenv("FAKTORY_URL"):
     os.environ["FAKTORY_URL"] = FAKTORY_URL
 
-def safe_get_author_feed(client, actor, cursor):
+def safe_get_author_feed(client, actor, cursor, limit=100):
     # tolerate vanished or invalid actors across atproto_client versions
     from atproto_client import exceptions as at_ex
     try:
-        return get_author_feed(client, actor, cursor)
+        with metrics.timer("bsky_fetch"):
+            return get_author_feed(client, actor, cursor, limit)
     except at_ex.BadRequestError as e:
         msg = str(e)
         # map common 4xx text variants to "profile-not-found"
@@ -78,69 +102,306 @@ def safe_get_author_feed(client, actor, cursor):
             return None, None
         raise
 
+# stands in for the thread JSON on a 304: nothing new, but the fetch succeeded
+# and the thread's catalog meta is current
+_NOT_MODIFIED: dict = {}
+
+def _fetch_thread(board: str, thread_no: int, last_seen: int = 0, replies: int = 0):
+    """(thread_no, thread JSON, _NOT_MODIFIED on a 304, or None if the fetch failed)."""
+    # long threads we've already seen: the tail usually has everything new
+    if last_seen and CHAN_TAIL_MIN_REPLIES and replies >= CHAN_TAIL_MIN_REPLIES:
+        try:
+            tail = get_thread_tail(board, thread_no)
+            if tail is None:
+                return thread_no, _NOT_MODIFIED
+            if tail_covers(tail, last_seen):
+                return thread_no, tail
+        except Exception:
+            pass  # the full thread below is authoritative
+    try:
+        tjson = get_thread(board, thread_no)
+    except Exception:
+        return thread_no, None
+    return thread_no, _NOT_MODIFIED if tjson is None else tjson
+
+def _iter_threads(board: str, jobs: List[tuple]):
+    """
+    Yield (thread_no, thread_json) as each fetch finishes; see _fetch_thread.
+    jobs are (thread_no, last_seen, replies) tuples for _fetch_thread.
+    Fetches run on a thread pool; chan_client's token bucket keeps the
+    request rate polite, so pass time is bounded by the rate limit.
+    """
+    if CHAN_FETCH_CONCURRENCY <= 1:
+        for job in jobs:
+            yield _fetch_thread(board, *job)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=CHAN_FETCH_CONCURRENCY)
+    try:
+        futures = [pool.submit(_fetch_thread, board, *job) for job in jobs]
+        for fut in as_completed(futures):
+            yield fut.result()
+    finally:
+        # don't keep fetching if the consumer bailed out early
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _thread_rows(board: str, thread_no: int, posts: List[dict], last_seen: int) -> List[dict]:
+    row_batch = []
+    for p in posts:
+        post_no = int(p.get("no", 0))
+        if post_no <= last_seen:
+            continue
+        ts = int(p.get("time", 0))
+        created_at = datetime.fromtimestamp(ts, tz=timezone.utc)
+        has_media = any(k in p for k in ("filename", "ext", "tim"))
+
+        row_batch.append({
+            "board_name": board,
+            "thread_number": thread_no,
+            "post_number": post_no,
+            "created_at": created_at,
+            "data": p,
+            "has_media": has_media,
+            **textnorm.chan_columns(p),
+        })
+    return row_batch
+
+def _catalog_meta(catalog) -> Dict[int, List[int]]:
+    """thread_no -> [last_modified, replies] from a catalog.json payload."""
+    meta: Dict[int, List[int]] = {}
+    for page in catalog:
+        for t in page.get("threads", []):
+            if "no" in t:
+                meta[int(t["no"])] = [int(t.get("last_modified", 0)), int(t.get("replies", 0))]
+    return meta
+
+def _record_poll(kind: str, name: str, new_posts: int) -> None:
+    """Feed the adaptive scheduler; never let it fail the crawl job."""
+    if not CRAWL_ADAPTIVE:
+        return
+    try:
+        with pooled_conn(DATABASE_URL) as conn:
+            interval = record_poll(conn, source_key(kind, name), new_posts)
+            conn.commit()
+        logger.info(f"sched: {kind}={name} new={new_posts} next_in={interval:.0f}s")
+    except Exception as e:
+        logger.warning(f"sched: record failed {kind}={name}: {e}")
+
+def _poll_failed(source: str) -> None:
+    """Retry a failed source soon instead of after claim_due's max-interval lease."""
+    if not CRAWL_ADAPTIVE:
+        return
+    try:
+        with pooled_conn(DATABASE_URL) as conn:
+            retry_soon(conn, [source])
+            conn.commit()
+    except Exception as e:
+        logger.warning(f"sched: retry_soon failed {source}: {e}")
+
+def _unique_job(key_fn):
+    """
+    Release the job's in-flight key (see inflight.py) when the job succeeds,
+    and record the job's run time, outcome and queue-to-start lag (the
+    in-flight claim time is when it was enqueued). A failed job keeps its
+    key while Faktory retries it, so the producer doesn't queue a second
+    copy meanwhile, and gives it up when its last retry fails.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def job(*args):
+            started = time.time()
+            outcome = "error"
+            try:
+                result = fn(*args)
+                outcome = "ok"
+                return result
+            finally:
+                metrics.observe("crawler_job_seconds", time.time() - started, job=fn.__name__)
+                metrics.inc("crawler_jobs_total", job=fn.__name__, outcome=outcome)
+                if outcome != "ok":
+                    # a no-op for keys that aren't scheduled sources (threads)
+                    _poll_failed(key_fn(*args))
+                if JOB_UNIQUE and outcome != "ok":
+                    try:
+                        with pooled_conn(DATABASE_URL) as conn:
+                            if inflight.fail(conn, key_fn(*args)):
+                                logger.warning(f"inflight: {fn.__name__}{args} out of retries, released")
+                            conn.commit()
+                    except Exception as e:
+                        logger.warning(f"inflight: fail count failed for {fn.__name__}{args}: {e}")
+                if JOB_UNIQUE and outcome == "ok":
+                    try:
+                        with pooled_conn(DATABASE_URL) as conn:
+                            enqueued_at = inflight.release(conn, key_fn(*args))
+                            conn.commit()
+                        if enqueued_at is not None:
+                            metrics.observe("crawler_job_queue_lag_seconds",
+                                            max(started - enqueued_at, 0.0), job=fn.__name__)
+                    except Exception as e:
+                        logger.warning(f"inflight: release failed for {fn.__name__}{args}: {e}")
+                metrics.persist()
+        return job
+    return deco
+
+def _thread_key(board: str, thread_no: int, *_) -> str:
+    return f"thread:{board}:{thread_no}"
+
+def _enqueue_threads(conn, board: str, jobs: List[tuple]) -> None:
+    """jobs are (thread_no, last_modified, replies) for crawl_thread."""
+    if JOB_UNIQUE:
+        # skip threads that already have a crawl_thread job queued or running
+        claimed = set(inflight.claim(conn, [_thread_key(board, n) for n, _, _ in jobs]))
+        conn.commit()
+        jobs = [j for j in jobs if _thread_key(board, j[0]) in claimed]
+    pushed = 0
+    try:
+        with Client() as client:
+            for thread_no, last_modified, replies in jobs:
+                client.queue("crawl_thread", args=[board, thread_no, last_modified, replies],
+                             queue=CHAN_FANOUT_QUEUE, retry=JOB_RETRIES)
+                pushed += 1
+    except Exception:
+        if JOB_UNIQUE:
+            # claims for jobs that never reached Faktory would block those threads for the TTL
+            for thread_no, _, _ in jobs[pushed:]:
+                inflight.release(conn, _thread_key(board, thread_no))
+            conn.commit()
+        raise
+
+@_unique_job(lambda board: source_key("board", board))
 def crawl_board(board: str):
     logger.info(f"4chan: crawl board={board}")
+    fanout = CHAN_FANOUT and CRAWL_STATE_BACKEND == "db"
+    if CHAN_FANOUT and not fanout:
+        logger.warning("4chan: CHAN_FANOUT needs CRAWL_STATE_BACKEND=db, crawling in-process")
 
-    last_seen_all = load_json(CHAN_LAST_SEEN_PATH)
-    board_map: Dict[str, int] = {k: int(v) for k, v in last_seen_all.get(board, {}).items()}
-
+    catalog_failed = False
     try:
         catalog = get_catalog(board)
     except Exception as e:
         logger.warning(f"4chan: catalog failed board={board}: {e}")
         catalog = []
+        catalog_failed = True
+    if catalog is None:
+        # 304: no thread on the board changed since the last pass
+        logger.info(f"4chan: board={board} catalog not modified")
+        catalog = []
 
-    active_threads: List[int] = []
-    for page in catalog:
-        for t in page.get("threads", []):
-            if "no" in t:
-                active_threads.append(int(t["no"]))
-
-    inserted = 0
-    conn = get_conn(DATABASE_URL)
+    inserted = flushes = 0
+    fanned_out = None
     try:
-        for thread_no in active_threads:
-            last_seen = int(board_map.get(str(thread_no), 0))
-            try:
-                tjson = get_thread(board, thread_no)
-            except Exception:
-                continue
+        with pooled_conn(DATABASE_URL) as conn:
+            state = BoardState(board).load(conn)
+
+            catalog_meta = _catalog_meta(catalog)
+            active_threads: List[int] = list(catalog_meta)
+            if CHAN_CATALOG_DIFF:
+                # unchanged since our last successful fetch -> nothing new to download
+                active_threads = [n for n in active_threads if state.meta.get(n) != catalog_meta[n]]
+            logger.info(f"4chan: board={board} threads={len(catalog_meta)} changed={len(active_threads)}")
+
+            if fanout:
+                # each thread becomes its own job; crawl_thread records its state.
+                # The posts land later, so estimate velocity from catalog reply deltas.
+                _enqueue_threads(conn, board, [(n, *catalog_meta[n]) for n in active_threads])
+                fanned_out = sum(max(catalog_meta[n][1] - state.meta.get(n, [0, 0])[1], 0)
+                                 for n in active_threads)
+                active_threads = []
+
+            # rows are buffered on the calling thread as each fetch lands and
+            # written a batch at a time; every flush stages the board state
+            # in the same transaction, so state never runs ahead of the posts
+            buf = WriteBuffer(conn, on_flush=[state.stage])
+            jobs = [(n, state.last_seen.get(n, 0), catalog_meta[n][1]) for n in active_threads]
+            for thread_no, tjson in _iter_threads(board, jobs):
+                if tjson is None:
+                    continue
+                # a 304 stages the meta too, or prune would age the thread
+                # out and the next pass would fetch it again
+                state.set_thread(thread_no, meta=catalog_meta[thread_no])
 
-            posts = tjson.get("posts", [])
-            new_posts = [p for p in posts if int(p.get("no", 0)) > last_seen]
-            if not new_posts:
-                continue
+                last_seen = state.last_seen.get(thread_no, 0)
+                row_batch = _thread_rows(board, thread_no, tjson.get("posts", []), last_seen)
+                if not row_batch:
+                    continue
 
-            row_batch = []
-            for p in new_posts:
-                post_no = int(p.get("no", 0))
-                ts = int(p.get("time", 0))
-                created_at = datetime.fromtimestamp(ts, tz=timezone.utc)
-                has_media = any(k in p for k in ("filename", "ext", "tim"))
-
-                row_batch.append({
-                    "board_name": board,
-                    "thread_number": thread_no,
-                    "post_number": post_no,
-                    "created_at": created_at,
-                    "data": p,
-                    "has_media": has_media,
-                })
-
-                board_map[str(thread_no)] = post_no
-
-            inserted_now = insert_4chan_posts(conn, row_batch)
-            inserted += inserted_now
-
-        last_seen_all[board] = {k: str(v) for k, v in board_map.items()}
-        save_json(CHAN_LAST_SEEN_PATH, last_seen_all)
-    finally:
-        conn.close()
+                state.set_thread(thread_no, last_post=row_batch[-1]["post_number"])
+                buf.add_4chan(row_batch)
+
+            # the rest, plus meta-only updates for threads that had nothing new
+            buf.flush()
+            inserted, flushes = buf.inserted, buf.flushes
+            # GC of threads that fell off the catalog (only when we have a fresh one)
+            pruned = state.prune(conn, catalog_meta) if catalog_meta else 0
+            conn.commit()
+            state.save()
+            if pruned:
+                logger.info(f"4chan: board={board} pruned_state_threads={pruned}")
+    except Exception:
+        # some threads' state may not be committed; don't let cached validators 304 the retry
+        forget(board)
+        raise
 
-    logger.info(f"4chan: board={board} inserted={inserted}")
+    if catalog_failed:
+        # an outage isn't a quiet board: keep the EWMA, come back soon
+        _poll_failed(source_key("board", board))
+    else:
+        _record_poll("board", board, inserted if fanned_out is None else fanned_out)
+    stats = get_cache_stats()
+    logger.info(f"4chan: board={board} inserted={inserted} flushes={flushes} "
+                f"http_not_modified={stats['not_modified']} http_fetched={stats['fetched']} "
+                f"bytes_saved={stats['bytes_saved']}")
     return {"board": board, "inserted": inserted}
 
+@_unique_job(_thread_key)
+def crawl_thread(board: str, thread_no: int, last_modified: int = 0, replies: int = 0):
+    """
+    Fan-out job: crawl one thread under an advisory lock on (board, thread).
+    The lock is held for the fetch and released by the commit that writes
+    the posts and the thread's state, so a thread is never fetched twice
+    for the same catalog change, whichever host picks the job up.
+    """
+    meta = [int(last_modified), int(replies)]
+    inserted = 0
+    try:
+        with pooled_conn(DATABASE_URL) as conn:
+            ensure_schema(conn)
+            if not try_lock_thread(conn, board, thread_no):
+                conn.rollback()
+                logger.info(f"4chan: board={board} thread={thread_no} skip reason=locked")
+                return {"board": board, "thread": thread_no, "inserted": 0}
+
+            state = BoardState(board).load_thread(conn, thread_no)
+            known = state.meta.get(thread_no)
+            if known is not None and (known == meta or known[0] > meta[0]):
+                # someone already handled this (or a newer) change
+                conn.rollback()
+                return {"board": board, "thread": thread_no, "inserted": 0}
+
+            last_seen = state.last_seen.get(thread_no, 0)
+            _, tjson = _fetch_thread(board, thread_no, last_seen, meta[1])
+            if tjson is None:
+                conn.rollback()
+                return {"board": board, "thread": thread_no, "inserted": 0}
+
+            state.set_thread(thread_no, meta=meta)
+            row_batch = _thread_rows(board, thread_no, tjson.get("posts", []), last_seen)
+            new_rows = seen.unseen_4chan(conn, row_batch)
+            if row_batch:
+                inserted = insert_4chan_posts(conn, new_rows, commit=False)
+                state.set_thread(thread_no, last_post=row_batch[-1]["post_number"])
+            state.stage(conn)
+            conn.commit()
+            seen.remember_4chan(new_rows)
+    except Exception:
+        forget(board, thread_no)
+        raise
+
+    logger.info(f"4chan: board={board} thread={thread_no} inserted={inserted}")
+    return {"board": board, "thread": thread_no, "inserted": inserted}
+
 # ---------- BLUESKY ----------
+@_unique_job(lambda actor: source_key("actor", actor))
 def crawl_bsky_actor(actor: str):
     if actor in DENY:
         logger.info("[bsky] denylist skip actor=%s", actor)
@@ -150,58 +411,53 @@ def crawl_bsky_actor(actor: str):
         return
     logger.info(f"bsky: actor={actor}")
 
-    cursors: Dict[str, str] = load_json(BSKY_CURSORS_PATH)
-    cursor = cursors.get(actor)
-
     client = get_bsky_client(BSKY_HANDLE, BSKY_APP_PASSWORD)
+    with pooled_conn(DATABASE_URL) as conn:
+        cursor = load_cursor(conn, actor)
+        head = load_heads(conn, [actor]).get(actor)
+        # feeds are fetched by DID; dead actors are skipped until their re-check
+        did = actor_cache.resolve(conn, client, [actor])[actor] if BSKY_ACTOR_CACHE else actor
+        conn.commit()
+    if did is None:
+        logger.info(f"bsky: skip actor={actor} reason=cached-dead")
+        return {"actor": actor, "inserted_total": 0}
+
     rows = []
     inserted_total = 0
 
-    # HEAD crawl
+    # HEAD crawl: newest first, stopping at the newest post we already have.
+    # With a known high-water mark the first page is a small probe.
     pages_fetched = 0
     next_cursor = None
+    reached_head = False
     while pages_fetched < BSKY_HEAD_PAGES:
-        feed, next_cursor = safe_get_author_feed(client, actor, None if pages_fetched == 0 else next_cursor)
+        limit = BSKY_HEAD_PROBE_LIMIT if head is not None and pages_fetched == 0 else 100
+        feed, next_cursor = safe_get_author_feed(client, did, None if pages_fetched == 0 else next_cursor, limit)
         if feed is None:
             # invalid actor, stop trying pages for this actor
+            if BSKY_ACTOR_CACHE:
+                with pooled_conn(DATABASE_URL) as conn:
+                    actor_cache.mark_dead(conn, actor)
+                    conn.commit()
             break
         pages_fetched += 1
 
-        for item in feed:
-            if getattr(item, "reason", None):
-                continue
-            post = getattr(item, "post", None)
-            if post is None:
-                continue
+        page_rows, reached_head = head_rows(actor, feed, head)
+        rows.extend(page_rows)
 
-            uri = getattr(post, "uri", None)
-            dt = getattr(post, "indexed_at", None)
-            data = as_primitive(post)
-
-            like_count = getattr(post, "like_count", None)
-            repost_count = getattr(post, "repost_count", None)
-            has_media = bool(getattr(post, "embed", None))
-
-            rows.append({
-                "actor": actor,
-                "uri": uri,
-                "created_at": dt,
-                "data": data,
-                "stance": None,
-                "like_count": like_count,
-                "repost_count": repost_count,
-                "has_media": has_media,
-            })
-
-        if not next_cursor:
+        if reached_head or not next_cursor:
             break
+    # the feed answered, so whatever its earlier misses the actor isn't dead
+    feed_ok = BSKY_ACTOR_CACHE and pages_fetched > 0
 
     # BACKFILL (optional)
     if BSKY_BACKFILL_PAGES > 0 and BSKY_MAX_BACKFILL_HOURS > 0:
         cutoff = datetime.now(timezone.utc) - timedelta(hours=BSKY_MAX_BACKFILL_HOURS)
         pages_fetched = 0
         while pages_fetched < BSKY_BACKFILL_PAGES:
-            feed, cursor = safe_get_author_feed(client, actor, cursor)
+            feed, cursor = safe_get_author_feed(client, did, cursor)
+            if feed is None:
+                break
             pages_fetched += 1
 
             for item in feed:
@@ -227,45 +483,130 @@ def crawl_bsky_actor(actor: str):
                     pages_fetched = BSKY_BACKFILL_PAGES
                     break
 
-                uri = getattr(post, "uri", None)
-                data = as_primitive(post)
-                like_count = getattr(post, "like_count", None)
-                repost_count = getattr(post, "repost_count", None)
-                has_media = bool(getattr(post, "embed", None))
-
-                rows.append({
-                    "actor": actor,
-                    "uri": uri,
-                    "created_at": parsed_dt or raw_dt,
-                    "data": data,
-                    "stance": None,
-                    "like_count": like_count,
-                    "repost_count": repost_count,
-                    "has_media": has_media,
-                })
+                row = post_row(actor, post)
+                row["created_at"] = parsed_dt or raw_dt
+                rows.append(row)
 
             if not cursor:
                 break
 
-    if rows:
-        conn = get_conn(DATABASE_URL)
-        try:
-            inserted_total = insert_bsky_posts(conn, rows)
-        finally:
-            conn.close()
-
-    if next_cursor:
-        cursors[actor] = next_cursor
-        save_json(BSKY_CURSORS_PATH, cursors)
-
+    # a head-stopped crawl's cursor is only a probe deep; keep the old one for backfill
+    save_next = bool(next_cursor) and not reached_head
+    if rows or save_next or feed_ok:
+        # posts, the actor's cursor and its high-water mark commit together
+        with pooled_conn(DATABASE_URL) as conn:
+            new_rows = seen.unseen_bsky(conn, rows)
+            inserted_total = insert_bsky_posts(conn, new_rows, commit=False)
+            if feed_ok:
+                actor_cache.mark_fetched(conn, actor)
+            if save_next:
+                save_cursor(conn, actor, next_cursor)
+            # from every fetched row: the head still moves when all were already stored
+            new_head = newest_head(rows)
+            if new_head:
+                save_head(conn, actor, new_head)
+            conn.commit()
+        seen.remember_bsky(new_rows)
+
+    _record_poll("actor", actor, inserted_total)
     logger.info(f"bsky: actor={actor} inserted_total={inserted_total}")
     return {"actor": actor, "inserted_total": inserted_total}
 
+def _stage_actor(conn, actor: str, cursor: Optional[str], head) -> None:
+    if cursor:
+        save_cursor(conn, actor, cursor)
+    if head:
+        save_head(conn, actor, head)
+
+@_unique_job(lambda: "bsky:all")
+def crawl_bsky_all():
+    """
+    Async pass over every configured actor (BSKY_ASYNC=1): feeds are fetched
+    concurrently under one shared, 429-aware rate limit, so the pass takes
+    about as long as the slowest actor. Backfill stays in crawl_bsky_actor.
+    """
+    from bsky_async import crawl_actors
+
+    actors = [a for a in BSKY_ACTORS if a not in DENY]
+    logger.info(f"bsky: async pass actors={len(actors)}")
+    with pooled_conn(DATABASE_URL) as conn:
+        heads = load_heads(conn, actors)
+        if BSKY_ACTOR_CACHE:
+            dids = actor_cache.resolve(conn, get_bsky_client(BSKY_HANDLE, BSKY_APP_PASSWORD), actors)
+            conn.commit()
+        else:
+            dids = {a: a for a in actors}
+    actors = [a for a in actors if dids[a] is not None]
+    results = crawl_actors(actors, heads, dids)
+
+    failed = 0
+    with pooled_conn(DATABASE_URL) as conn:
+        # every actor's posts, cursor and high-water mark land in the same flush
+        buf = WriteBuffer(conn)
+        for actor, result in results.items():
+            if isinstance(result, Exception):
+                failed += 1
+                logger.warning(f"bsky: actor={actor} failed: {result}")
+                continue
+            if result is None:
+                # feed said the actor is gone
+                if BSKY_ACTOR_CACHE:
+                    buf.add_bsky([], stage=functools.partial(actor_cache.mark_dead, actor=actor))
+                continue
+            if BSKY_ACTOR_CACHE:
+                buf.add_bsky([], stage=functools.partial(actor_cache.mark_fetched, actor=actor))
+            rows, next_cursor, reached_head = result
+            save_next = bool(next_cursor) and not reached_head
+            if not rows and not save_next:
+                continue
+            buf.add_bsky(rows, stage=functools.partial(
+                _stage_actor, actor=actor,
+                cursor=next_cursor if save_next else None, head=newest_head(rows)))
+        buf.flush()
+        inserted_total = buf.inserted
+
+    _record_poll("bsky", "all", inserted_total)
+    logger.info(f"bsky: async pass actors={len(actors)} failed={failed} inserted_total={inserted_total}")
+    return {"actors": len(actors), "failed": failed, "inserted_total": inserted_total}
+
+@_unique_job(lambda: "bsky:engagement")
+def refresh_bsky_engagement():
+    """
+    Re-read like/repost counts for recent posts that are due by age tier
+    (see engagement.py), 25 per getPosts call.
+    """
+    with pooled_conn(DATABASE_URL) as conn:
+        posts = engagement.due_posts(conn)
+        conn.commit()
+    updated = 0
+    if posts:
+        counts = engagement.fetch_counts(get_bsky_client(BSKY_HANDLE, BSKY_APP_PASSWORD),
+                                         [uri for uri, _ in posts])
+        with pooled_conn(DATABASE_URL) as conn:
+            updated = engagement.store_counts(conn, posts, counts)
+            conn.commit()
+
+    _record_poll("bsky", "engagement", len(posts))
+    logger.info(f"bsky: engagement due={len(posts)} updated={updated}")
+    return {"due": len(posts), "updated": updated}
+
 def main():
     # IMPORTANT: BSKY_ACTORS is now coming from the env / config we just loaded
+    # job processes snapshot their metrics; this (parent) process serves them
+    metrics.serve()
+    # rows carry the normalized-text columns; add them before any job inserts.
+    # A plain connection, closed before the fork: job processes build their own pools.
+    conn = get_conn(DATABASE_URL)
+    try:
+        textnorm.ensure_schema(conn)
+    finally:
+        conn.close()
     w = Worker(queues=['default', 'crawl'])
     w.register('crawl_board', crawl_board)
+    w.register('crawl_thread', crawl_thread)
     w.register('crawl_bsky_actor', crawl_bsky_actor)
+    w.register('crawl_bsky_all', crawl_bsky_all)
+    w.register('refresh_bsky_engagement', refresh_bsky_engagement)
     w.run()
 
 if __name__ == "__main__":
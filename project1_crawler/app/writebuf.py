@@ -0,0 +1,104 @@
+"""
+Write buffer for crawl jobs: posts from many threads (or actors) go to the
+database in one transaction instead of one commit each.
+
+A flush happens once WRITE_BUFFER_ROWS rows or about WRITE_BUFFER_BYTES of
+post data are buffered, or WRITE_BUFFER_SECONDS after the first buffered
+row. Crawl state is written by the flush callbacks inside that same
+transaction, so it only advances when the posts it covers are committed;
+a crash before a flush just means those threads are fetched again.
+
+Rows the seen-post filter (seen.py) knows are stored are dropped on add.
+"""
+import time
+from typing import Callable, List, Optional
+
+from config import WRITE_BUFFER_ROWS, WRITE_BUFFER_BYTES, WRITE_BUFFER_SECONDS
+from db import insert_4chan_posts, insert_bsky_posts
+import metrics
+import seen
+
+def _approx_bytes(row: dict) -> int:
+    # shallow guess at the encoded size; exact would mean serializing twice
+    data = row.get("data")
+    if not isinstance(data, dict):
+        return 64
+    return 64 + sum(len(v) if isinstance(v, str) else 8 for v in data.values())
+
+class WriteBuffer:
+    """
+    buf = WriteBuffer(conn, on_flush=[state.stage])
+    buf.add_4chan(rows); buf.add_bsky(rows, stage=lambda c: save_cursor(c, ...))
+    ...; buf.flush()   # always flush at the end
+
+    on_flush callbacks run on every flush, add()-time `stage` callbacks
+    once with the flush that writes their rows; all get the connection
+    and must not commit.
+    """
+
+    def __init__(self, conn, on_flush: Optional[List[Callable]] = None,
+                 max_rows: int = WRITE_BUFFER_ROWS, max_bytes: int = WRITE_BUFFER_BYTES,
+                 max_seconds: float = WRITE_BUFFER_SECONDS):
+        self.conn = conn
+        self.on_flush = list(on_flush or [])
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.inserted = 0
+        self.flushes = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._chan: List[dict] = []
+        self._bsky: List[dict] = []
+        self._stages: List[Callable] = []
+        self._bytes = 0
+        self._since: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._chan) + len(self._bsky)
+
+    def add_4chan(self, rows: List[dict], stage: Optional[Callable] = None) -> int:
+        return self._add(self._chan, seen.unseen_4chan(self.conn, rows), stage)
+
+    def add_bsky(self, rows: List[dict], stage: Optional[Callable] = None) -> int:
+        return self._add(self._bsky, seen.unseen_bsky(self.conn, rows), stage)
+
+    def _add(self, dest: List[dict], rows: List[dict], stage: Optional[Callable]) -> int:
+        """Buffer rows; flushes if that crosses a threshold. Returns rows inserted by that flush."""
+        dest.extend(rows)
+        self._bytes += sum(_approx_bytes(r) for r in rows)
+        if stage is not None:
+            self._stages.append(stage)
+        if self._since is None:
+            self._since = time.monotonic()
+        return self.flush() if self.due() else 0
+
+    def due(self) -> bool:
+        if self._since is None:
+            return False
+        return (len(self) >= self.max_rows
+                or self._bytes >= self.max_bytes
+                or time.monotonic() - self._since >= self.max_seconds)
+
+    def flush(self) -> int:
+        """Write everything buffered plus the state callbacks, then commit once."""
+        chan, bsky = self._chan, self._bsky
+        try:
+            inserted = insert_4chan_posts(self.conn, chan, commit=False)
+            inserted += insert_bsky_posts(self.conn, bsky, commit=False)
+            with metrics.timer("state_save"):
+                for stage in self._stages + self.on_flush:
+                    stage(self.conn)
+            with metrics.timer("db_commit"):
+                self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self._reset()
+        seen.remember_4chan(chan)
+        seen.remember_bsky(bsky)
+        self.inserted += inserted
+        self.flushes += 1
+        return inserted
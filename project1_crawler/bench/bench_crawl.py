@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+End-to-end crawl throughput against local fake 4chan and Bluesky servers
+(fake_servers.py), so crawler changes can be compared on the same
+reproducible workload without touching the live APIs.
+
+Round 0 is a cold crawl; before every later round the fake world ticks
+(churned threads get new replies, every actor gets new posts). Each round
+runs crawl_board for every board and crawl_bsky_actor for every actor,
+the same job functions the worker runs, and reports threads/sec,
+rows/sec and bytes served; p50/p99 job times are reported at the end.
+
+Runs against DATABASE_URL but only touches a throwaway `bench_crawl`
+schema (posts tables plus whatever the crawl state modules create), which
+is dropped at the end. Needs atproto for the Bluesky half.
+
+    python3 bench/bench_crawl.py --rounds 5 --threads 150 --latency-ms 20
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import config
+from fake_servers import Fake4chan, FakeBsky
+
+SCHEMA = "bench_crawl"
+
+def _with_search_path(dsn: str, schema: str) -> str:
+    return dsn + ("&" if "?" in dsn else "?") + f"options=-csearch_path%3D{schema}"
+
+def _configure(args, chan: Fake4chan, bsky: FakeBsky) -> None:
+    """Point config at the fakes and the bench schema, before the crawler modules import it."""
+    os.environ.update({
+        "DATABASE_URL": _with_search_path(args.dsn, SCHEMA),
+        "CHAN_API_BASE": f"http://127.0.0.1:{chan.port}",
+        "CHAN_BOARDS": ",".join(args.boards),
+        "CHAN_REQUESTS_PER_SECOND": "0",
+        "CHAN_FANOUT": "0",
+        "BSKY_BASE_URL": f"http://127.0.0.1:{bsky.port}/xrpc",
+        "BSKY_ACTORS": ",".join(bsky.handles),
+        "BSKY_HANDLE": "bench.test",
+        "BSKY_APP_PASSWORD": "bench",
+        "BSKY_SESSION_STORE": "none",
+        "BSKY_REQUESTS_PER_SECOND": "0",
+        "CRAWL_STATE_BACKEND": "db",
+        "CRAWL_ADAPTIVE": "0",
+        "JOB_UNIQUE": "0",
+        "METRICS_PORT": "0",
+    })
+    importlib.reload(config)
+
+def _check_config(chan: Fake4chan) -> None:
+    # worker.py loads its env files with override=True; config is already
+    # imported by then, but make sure nothing points at the real APIs
+    import chan_client
+    if chan_client.BASE != config.CHAN_API_BASE or str(chan.port) not in chan_client.BASE:
+        sys.exit(f"refusing to run: 4chan base is {chan_client.BASE}")
+    if not (config.BSKY_BASE_URL or "").startswith("http://127.0.0.1:"):
+        sys.exit(f"refusing to run: bsky base is {config.BSKY_BASE_URL}")
+
+def _count(conn, table: str) -> int:
+    cur = conn.cursor()
+    cur.execute(f"SELECT count(*) FROM {SCHEMA}.{table}")
+    n = cur.fetchone()[0]
+    conn.commit()
+    return n
+
+def _pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def _run_jobs(fn, names, concurrency: int, times: list) -> None:
+    def one(name):
+        t0 = time.perf_counter()
+        fn(name)
+        times.append(time.perf_counter() - t0)
+    if concurrency <= 1:
+        for name in names:
+            one(name)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, names))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--boards", default="sp,pol")
+    ap.add_argument("--threads", type=int, default=150, help="threads per board")
+    ap.add_argument("--posts", type=int, default=100, help="posts per thread at start")
+    ap.add_argument("--churn", type=float, default=0.2, help="share of threads bumped per tick")
+    ap.add_argument("--new-posts", type=int, default=5, help="replies per bumped thread / posts per actor per tick")
+    ap.add_argument("--actors", type=int, default=35)
+    ap.add_argument("--feed-size", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake response")
+    ap.add_argument("--concurrency", type=int, default=1, help="jobs run at once (threads in one process)")
+    ap.add_argument("--skip-bsky", action="store_true")
+    ap.add_argument("--dsn", default=config.DATABASE_URL)
+    args = ap.parse_args()
+    args.boards = [b for b in args.boards.split(",") if b]
+
+    chan = Fake4chan(boards=args.boards, threads=args.threads, posts=args.posts, churn=args.churn,
+                     new_posts=args.new_posts, latency_ms=args.latency_ms).start()
+    bsky = FakeBsky(actors=args.actors, feed_size=args.feed_size, new_posts=args.new_posts,
+                    latency_ms=args.latency_ms).start()
+    _configure(args, chan, bsky)
+
+    # crawler modules read config at import time, so only import them now
+    from bench_ingest import ddl
+    from db import get_conn
+    conn = get_conn(args.dsn)
+    cur = conn.cursor()
+    cur.execute(ddl(SCHEMA))
+    conn.commit()
+
+    import worker
+    _check_config(chan)
+
+    job_times = {"crawl_board": [], "crawl_bsky_actor": []}
+    try:
+        for rnd in range(args.rounds):
+            if rnd:
+                chan.tick()
+                if not args.skip_bsky:
+                    bsky.tick()
+
+            before = {t: _count(conn, t) for t in ("posts_4chan", "posts_bsky")}
+            served = (chan.threads_served, chan.bytes_sent, bsky.bytes_sent)
+
+            t0 = time.perf_counter()
+            _run_jobs(worker.crawl_board, args.boards, args.concurrency, job_times["crawl_board"])
+            chan_secs = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            if not args.skip_bsky:
+                _run_jobs(worker.crawl_bsky_actor, bsky.handles, args.concurrency, job_times["crawl_bsky_actor"])
+            bsky_secs = time.perf_counter() - t0
+
+            chan_rows = _count(conn, "posts_4chan") - before["posts_4chan"]
+            bsky_rows = _count(conn, "posts_bsky") - before["posts_bsky"]
+            threads = chan.threads_served - served[0]
+            print(f"round {rnd}: 4chan threads={threads} rows={chan_rows} secs={chan_secs:.2f} "
+                  f"threads/sec={threads / chan_secs:,.1f} rows/sec={chan_rows / chan_secs:,.0f} "
+                  f"bytes={chan.bytes_sent - served[1]:,}")
+            if not args.skip_bsky:
+                print(f"round {rnd}: bsky  actors={len(bsky.handles)} rows={bsky_rows} secs={bsky_secs:.2f} "
+                      f"rows/sec={bsky_rows / max(bsky_secs, 1e-9):,.0f} bytes={bsky.bytes_sent - served[2]:,}")
+
+        print(f"coverage: 4chan stored={_count(conn, 'posts_4chan')} served={chan.total_posts()}"
+              + ("" if args.skip_bsky else
+                 f"  bsky stored={_count(conn, 'posts_bsky')} served={bsky.total_posts()}"))
+        print(f"requests: 4chan={chan.requests} bsky={bsky.requests}")
+        for job, times in job_times.items():
+            if times:
+                print(f"{job:17s} jobs={len(times)} p50={_pct(times, 0.5) * 1000:.0f}ms "
+                      f"p99={_pct(times, 0.99) * 1000:.0f}ms max={max(times) * 1000:.0f}ms")
+    finally:
+        chan.stop()
+        bsky.stop()
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
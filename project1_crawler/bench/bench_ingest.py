@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Rows/sec for the two ingest paths in db.py (executemany vs COPY + merge).
+
+Runs against DATABASE_URL but only touches a throwaway `bench_ingest`
+schema, which is dropped at the end:
+
+    python3 bench/bench_ingest.py --rows 50000 --batch 200
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from config import DATABASE_URL
+from db import get_conn, insert_4chan_posts, insert_bsky_posts
+
+SCHEMA = "bench_ingest"
+
+def ddl(schema: str) -> str:
+    """Fresh `schema` with the two post tables (also used by bench_crawl.py)."""
+    return f"""
+DROP SCHEMA IF EXISTS {schema} CASCADE;
+CREATE SCHEMA {schema};
+CREATE TABLE {schema}.posts_4chan (
+    board_name    text        NOT NULL,
+    thread_number bigint      NOT NULL,
+    post_number   bigint      NOT NULL,
+    created_at    timestamptz NOT NULL,
+    data          jsonb,
+    has_media     boolean,
+    text_plain    text,
+    quote_links   bigint[],
+    char_count    integer,
+    word_count    integer,
+    text_hash     bigint,
+    PRIMARY KEY (board_name, thread_number, post_number, created_at)
+);
+CREATE TABLE {schema}.posts_bsky (
+    actor        text        NOT NULL,
+    uri          text        NOT NULL,
+    created_at   timestamptz NOT NULL,
+    data         jsonb,
+    stance       text,
+    like_count   integer,
+    repost_count integer,
+    has_media    boolean,
+    text_plain   text,
+    quote_links  text[],
+    char_count   integer,
+    word_count   integer,
+    text_hash    bigint,
+    PRIMARY KEY (uri, created_at)
+);
+"""
+
+DDL = ddl(SCHEMA)
+
+def make_4chan_rows(n: int):
+    base = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        thread_no = 100000 + i // 300
+        post_no = 200000 + i
+        com = "&gt;&gt;%d<br>" % (post_no - 1) + " ".join(
+            random.choice(["based", "game", "ref", "cope", "trade", "goal"]) for _ in range(30))
+        rows.append({
+            "board_name": "sp",
+            "thread_number": thread_no,
+            "post_number": post_no,
+            "created_at": base + timedelta(seconds=i),
+            "data": {"no": post_no, "resto": thread_no, "time": 1761955200 + i,
+                     "name": "Anonymous", "com": com},
+            "has_media": i % 7 == 0,
+        })
+    return rows
+
+def make_bsky_rows(n: int):
+    base = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        uri = f"at://did:plc:bench{i % 35}/app.bsky.feed.post/{i:012d}"
+        rows.append({
+            "actor": f"actor{i % 35}.bsky.social",
+            "uri": uri,
+            "created_at": base + timedelta(seconds=i),
+            "data": {"uri": uri, "record": {"text": "post %d tab\there" % i,
+                                            "created_at": (base + timedelta(seconds=i)).isoformat()}},
+            "stance": None,
+            "like_count": i % 50,
+            "repost_count": i % 9,
+            "has_media": i % 3 == 0,
+        })
+    return rows
+
+def run(conn, fn, rows, batch: int, mode: str):
+    cur = conn.cursor()
+    cur.execute(f"TRUNCATE {SCHEMA}.posts_4chan, {SCHEMA}.posts_bsky")
+    conn.commit()
+
+    t0 = time.perf_counter()
+    inserted = 0
+    for start in range(0, len(rows), batch):
+        inserted += fn(conn, rows[start:start + batch], mode=mode)
+    elapsed = time.perf_counter() - t0
+
+    # re-sending everything must report zero new rows
+    dup = sum(fn(conn, rows[s:s + batch], mode=mode) for s in range(0, len(rows), batch))
+    return inserted, dup, elapsed
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--batch", type=int, default=200, help="rows per insert call (about one thread)")
+    ap.add_argument("--dsn", default=DATABASE_URL)
+    args = ap.parse_args()
+
+    conn = get_conn(args.dsn)
+    cur = conn.cursor()
+    cur.execute(DDL)
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    conn.commit()
+
+    try:
+        for name, fn, rows in (("posts_4chan", insert_4chan_posts, make_4chan_rows(args.rows)),
+                               ("posts_bsky", insert_bsky_posts, make_bsky_rows(args.rows))):
+            for mode in ("executemany", "copy"):
+                inserted, dup, elapsed = run(conn, fn, rows, args.batch, mode)
+                print(f"{name:12s} {mode:12s} rows={len(rows)} inserted={inserted} "
+                      f"dup_inserted={dup} secs={elapsed:.2f} rows/sec={len(rows) / elapsed:,.0f}")
+    finally:
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+CPU per row for building and encoding the jsonb `data` column, old vs new:
+
+  bsky:  model_dump() + stdlib json    vs  post_projection() + fastjson
+  4chan: stdlib json                   vs  fastjson
+
+No database or network needed; the Bluesky part needs atproto installed.
+
+    python3 bench/bench_serialize.py --rows 20000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import fastjson
+
+# a typical author-feed post: link card, facets, full author profile
+POST_VIEW = {
+    "$type": "app.bsky.feed.defs#postView",
+    "uri": "at://did:plc:abcdefghijklmnopqrstuvwx/app.bsky.feed.post/3kabcdefghij2",
+    "cid": "bafyreigh2akiscaildcqabsyg3dfr6chu3fgpregiymsck7e7aqa4s52zy",
+    "author": {
+        "did": "did:plc:abcdefghijklmnopqrstuvwx",
+        "handle": "newsdesk.bsky.social",
+        "displayName": "News Desk",
+        "avatar": "https://cdn.bsky.app/img/avatar/plain/did:plc:abcdefghijklmnopqrstuvwx/bafkrei@jpeg",
+        "labels": [],
+        "createdAt": "2023-05-01T12:00:00.000Z",
+        "viewer": {"muted": False, "blockedBy": False},
+    },
+    "record": {
+        "$type": "app.bsky.feed.post",
+        "text": "Senate passes the budget bill after a late-night session; full coverage and analysis at the link.",
+        "createdAt": "2024-11-05T03:12:45.123Z",
+        "langs": ["en"],
+        "facets": [{
+            "index": {"byteStart": 0, "byteEnd": 6},
+            "features": [{"$type": "app.bsky.richtext.facet#tag", "tag": "senate"}],
+        }],
+        "embed": {
+            "$type": "app.bsky.embed.external",
+            "external": {
+                "uri": "https://example.com/politics/budget-bill",
+                "title": "Senate passes budget bill",
+                "description": "Lawmakers approved the measure 52-48 after hours of debate.",
+            },
+        },
+    },
+    "embed": {
+        "$type": "app.bsky.embed.external#view",
+        "external": {
+            "uri": "https://example.com/politics/budget-bill",
+            "title": "Senate passes budget bill",
+            "description": "Lawmakers approved the measure 52-48 after hours of debate.",
+            "thumb": "https://cdn.bsky.app/img/feed_thumbnail/plain/did:plc:abcdefghijklmnopqrstuvwx/bafkrei@jpeg",
+        },
+    },
+    "replyCount": 12,
+    "repostCount": 40,
+    "likeCount": 230,
+    "quoteCount": 3,
+    "indexedAt": "2024-11-05T03:12:46.001Z",
+    "viewer": {"threadMuted": False, "embeddingDisabled": False},
+    "labels": [],
+}
+
+CHAN_POST = {
+    "no": 481516234, "resto": 481500000, "now": "11/05/24(Tue)03:12:45", "time": 1730776365,
+    "name": "Anonymous", "id": "Ab3dE9fQ", "country": "US", "country_name": "United States",
+    "com": "&gt;&gt;481516001<br>Based take, but the budget numbers don't add up.<br><br>"
+           "<span class=\"quote\">&gt;deficit neutral</span><br>Sure.",
+    "filename": "chart", "ext": ".png", "w": 1200, "h": 800, "tn_w": 250, "tn_h": 166,
+    "tim": 1730776365123, "md5": "q2kX1q0m6Xbq3w0V8x1Y6A==", "fsize": 183422,
+}
+
+def timeit(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=20000)
+    args = ap.parse_args()
+    n = args.rows
+    print(f"fast encoder: {'orjson' if fastjson.orjson is not None else 'stdlib json (orjson not installed)'}")
+
+    old = timeit(lambda: json.dumps(CHAN_POST), n)
+    new = timeit(lambda: fastjson.dumps(CHAN_POST), n)
+    print(f"4chan  json.dumps              {old:7.2f} us/row")
+    print(f"4chan  fastjson.dumps          {new:7.2f} us/row   x{old / new:.1f}")
+
+    try:
+        from atproto_client import models
+        from atproto_client.models.utils import get_or_create
+        from bsky_client import as_primitive, post_projection
+    except ImportError as e:
+        print(f"bsky   skipped ({e})")
+        return
+
+    post = get_or_create(POST_VIEW, models.AppBskyFeedDefs.PostView)
+    old = timeit(lambda: json.dumps(as_primitive(post), default=str), n)
+    new = timeit(lambda: fastjson.dumps(post_projection(post)), n)
+    print(f"bsky   model_dump + json       {old:7.2f} us/row   "
+          f"{len(json.dumps(as_primitive(post), default=str))} bytes")
+    print(f"bsky   projection + fastjson   {new:7.2f} us/row   "
+          f"{len(fastjson.dumps(post_projection(post)))} bytes   x{old / new:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the 4chan read API and the Bluesky XRPC endpoints the
+crawler uses, serving synthetic, deterministic data. Used by
+bench_crawl.py; can also be run on its own to point a worker at:
+
+    python3 bench/fake_servers.py --chan-port 8081 --bsky-port 8082
+    CHAN_API_BASE=http://127.0.0.1:8081 BSKY_BASE_URL=http://127.0.0.1:8082/xrpc ...
+
+tick() advances the world: `churn` of the threads get `new_posts` replies
+(and a new last_modified), and every actor gets `new_posts` posts.
+Both honour If-Modified-Since like the real 4chan API, add `latency_ms`
+to every response, and count requests and bytes served.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = ("based", "game", "ref", "cope", "trade", "goal", "season", "vote", "bill", "league",
+         "senate", "draft", "poll", "coach", "market", "policy", "transfer", "debate")
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+class _Server:
+    """Threaded HTTP server on 127.0.0.1 with request/byte counters."""
+
+    def __init__(self, port: int, latency_ms: float):
+        self.latency = latency_ms / 1000.0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                owner._dispatch(self, "GET")
+
+            def do_POST(self):
+                owner._dispatch(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def start(self) -> "_Server":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+
+    def _dispatch(self, h, method: str) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "POST":
+            length = int(h.headers.get("Content-Length") or 0)
+            if length:
+                h.rfile.read(length)
+        parts = urlsplit(h.path)
+        status, body, headers = self.route(method, parts.path, parse_qs(parts.query), h.headers)
+        data = b"" if body is None else json.dumps(body, separators=(",", ":")).encode()
+        h.send_response(status)
+        for k, v in headers.items():
+            h.send_header(k, v)
+        if body is not None:
+            h.send_header("Content-Type", "application/json")
+        h.send_header("Content-Length", str(len(data)))
+        h.end_headers()
+        h.wfile.write(data)
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(data)
+
+    def route(self, method, path, query, headers):
+        raise NotImplementedError
+
+# ---------- 4chan ----------
+
+class Fake4chan(_Server):
+    """
+    boards x threads, each starting with `posts` posts. Thread JSON,
+    -tail.json (OP + last 50) and catalog.json with last_modified/replies.
+    """
+
+    TAIL = 50
+
+    def __init__(self, boards=("sp", "pol"), threads: int = 150, posts: int = 100,
+                 churn: float = 0.2, new_posts: int = 5, latency_ms: float = 0.0,
+                 port: int = 0, seed: int = 1):
+        super().__init__(port, latency_ms)
+        self.rng = random.Random(seed)
+        self.churn = churn
+        self.new_posts = new_posts
+        self.clock = int(time.time()) - 86400
+        self.next_no = 1_000_000
+        self.threads_served = 0
+        # board -> thread_no -> [posts...]; board -> thread_no -> last_modified
+        self.threads = {b: {} for b in boards}
+        self.modified = {b: {} for b in boards}
+        for b in boards:
+            for _ in range(threads):
+                op = self._post(0)
+                self.threads[b][op["no"]] = [op] + [self._post(op["no"]) for _ in range(posts - 1)]
+                self.modified[b][op["no"]] = self.clock
+
+    def _post(self, resto: int) -> dict:
+        self.next_no += 1
+        self.clock += 1
+        p = {"no": self.next_no, "resto": resto, "time": self.clock, "name": "Anonymous",
+             "com": f"&gt;&gt;{self.next_no - 1}<br>" + _text(self.rng, self.rng.randint(5, 60))}
+        if self.rng.random() < 0.15:
+            p.update({"filename": "img", "ext": ".jpg", "tim": self.clock * 1000, "fsize": 90000})
+        return p
+
+    def tick(self) -> int:
+        """Bump `churn` of every board's threads; returns posts added."""
+        added = 0
+        with self.lock:
+            for b, threads in self.threads.items():
+                for no in self.rng.sample(sorted(threads), int(len(threads) * self.churn)):
+                    threads[no].extend(self._post(no) for _ in range(self.new_posts))
+                    self.modified[b][no] = self.clock
+                    added += self.new_posts
+        return added
+
+    def total_posts(self) -> int:
+        return sum(len(p) for t in self.threads.values() for p in t.values())
+
+    def route(self, method, path, query, headers):
+        parts = path.strip("/").split("/")
+        board = parts[0] if parts else ""
+        if board not in self.threads:
+            return 404, None, {}
+        with self.lock:
+            if parts[1:] == ["catalog.json"]:
+                modified = max(self.modified[board].values())
+                body = [{"page": 1, "threads": [
+                    {"no": no, "last_modified": self.modified[board][no], "replies": len(posts) - 1}
+                    for no, posts in self.threads[board].items()]}]
+            elif len(parts) == 3 and parts[1] == "thread":
+                name = parts[2][:-len(".json")]
+                tail = name.endswith("-tail")
+                no = int(name[:-len("-tail")] if tail else name)
+                if no not in self.threads[board]:
+                    return 404, None, {}
+                modified = self.modified[board][no]
+                posts = self.threads[board][no]
+                op = dict(posts[0], replies=len(posts) - 1)
+                body = {"posts": [op] + (posts[-self.TAIL:] if tail and len(posts) > self.TAIL
+                                         else posts[1:])}
+            else:
+                return 404, None, {}
+
+        since = headers.get("If-Modified-Since")
+        if since:
+            try:
+                if parsedate_to_datetime(since).timestamp() >= modified:
+                    return 304, None, {}
+            except (TypeError, ValueError):
+                pass
+        if isinstance(body, dict):
+            with self.lock:
+                self.threads_served += 1
+        return 200, body, {"Last-Modified": formatdate(modified, usegmt=True)}
+
+# ---------- Bluesky ----------
+
+def _jwt(exp: int) -> str:
+    def seg(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{seg({'alg': 'HS256', 'typ': 'JWT'})}.{seg({'exp': exp, 'scope': 'com.atproto.access'})}.sig"
+
+class FakeBsky(_Server):
+    """
+    `actors` accounts with `feed_size` posts each, served newest first by
+    getAuthorFeed (limit/cursor pagination); plus createSession,
+    refreshSession, getProfile, resolveHandle and getPosts.
+    """
+
+    def __init__(self, actors: int = 35, feed_size: int = 300, new_posts: int = 3,
+                 latency_ms: float = 0.0, port: int = 0, seed: int = 2):
+        super().__init__(port, latency_ms)
+        self.rng = random.Random(seed)
+        self.new_posts = new_posts
+        self.clock = time.time() - 86400
+        self.handles = [f"actor{i}.bench.test" for i in range(actors)]
+        self.feeds = {h: [] for h in self.handles}   # oldest first
+        self.by_uri = {}
+        for h in self.handles:
+            for _ in range(feed_size):
+                self._add(h)
+
+    @staticmethod
+    def did(handle: str) -> str:
+        return "did:plc:" + handle.split(".")[0]
+
+    def _add(self, handle: str) -> None:
+        self.clock += 1.7
+        did = self.did(handle)
+        n = len(self.feeds[handle])
+        ts = datetime.fromtimestamp(self.clock, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+        uri = f"at://{did}/app.bsky.feed.post/{n:013d}"
+        post = {
+            "uri": uri,
+            "cid": f"bafyrei{n:040d}",
+            "author": {"did": did, "handle": handle},
+            "record": {"$type": "app.bsky.feed.post", "text": _text(self.rng, self.rng.randint(5, 40)),
+                       "createdAt": ts, "langs": ["en"]},
+            "indexedAt": ts,
+            "likeCount": self.rng.randint(0, 500),
+            "repostCount": self.rng.randint(0, 80),
+            "replyCount": self.rng.randint(0, 40),
+        }
+        if self.rng.random() < 0.3:
+            post["embed"] = {"$type": "app.bsky.embed.external#view", "external": {
+                "uri": f"https://example.com/{n}", "title": _text(self.rng, 6),
+                "description": _text(self.rng, 15)}}
+        self.feeds[handle].append(post)
+        self.by_uri[uri] = post
+
+    def tick(self) -> int:
+        with self.lock:
+            for h in self.handles:
+                for _ in range(self.new_posts):
+                    self._add(h)
+        return self.new_posts * len(self.handles)
+
+    def total_posts(self) -> int:
+        return sum(len(f) for f in self.feeds.values())
+
+    def _handle_for(self, actor: str):
+        if actor in self.feeds:
+            return actor
+        return next((h for h in self.handles if self.did(h) == actor), None)
+
+    def route(self, method, path, query, headers):
+        nsid = path.rsplit("/", 1)[-1]
+        q = {k: v[0] for k, v in query.items()}
+        if nsid in ("com.atproto.server.createSession", "com.atproto.server.refreshSession"):
+            now = int(time.time())
+            return 200, {"did": "did:plc:benchuser", "handle": "bench.test",
+                         "accessJwt": _jwt(now + 7200), "refreshJwt": _jwt(now + 86400 * 60)}, {}
+        if nsid == "app.bsky.actor.getProfile":
+            return 200, {"did": "did:plc:benchuser", "handle": "bench.test"}, {}
+        if nsid == "com.atproto.identity.resolveHandle":
+            handle = self._handle_for(q.get("handle", ""))
+            if handle is None:
+                return 400, {"error": "InvalidRequest", "message": "Unable to resolve handle"}, {}
+            return 200, {"did": self.did(handle)}, {}
+        if nsid == "app.bsky.feed.getAuthorFeed":
+            handle = self._handle_for(q.get("actor", ""))
+            if handle is None:
+                return 400, {"error": "InvalidRequest", "message": "Profile not found"}, {}
+            limit = min(int(q.get("limit", 50)), 100)
+            start = int(q.get("cursor") or 0)
+            with self.lock:
+                newest_first = self.feeds[handle][::-1]
+            page = newest_first[start:start + limit]
+            body = {"feed": [{"post": p} for p in page]}
+            if start + limit < len(newest_first):
+                body["cursor"] = str(start + limit)
+            return 200, body, {}
+        if nsid == "app.bsky.feed.getPosts":
+            uris = query.get("uris", [])[:25]
+            with self.lock:
+                return 200, {"posts": [self.by_uri[u] for u in uris if u in self.by_uri]}, {}
+        return 404, {"error": "MethodNotImplemented", "message": nsid}, {}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chan-port", type=int, default=8081)
+    ap.add_argument("--bsky-port", type=int, default=8082)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--tick-seconds", type=float, default=30.0, help="advance the world this often")
+    args = ap.parse_args()
+
+    chan = Fake4chan(port=args.chan_port, latency_ms=args.latency_ms).start()
+    bsky = FakeBsky(port=args.bsky_port, latency_ms=args.latency_ms).start()
+    print(f"4chan: CHAN_API_BASE=http://127.0.0.1:{chan.port}")
+    print(f"bsky:  BSKY_BASE_URL=http://127.0.0.1:{bsky.port}/xrpc")
+    while True:
+        time.sleep(args.tick_seconds)
+        print(f"tick: 4chan +{chan.tick()} posts, bsky +{bsky.tick()} posts", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -93,6 +93,10 @@ def parse_record_to_text(series):
     return s
 
 def pick_text_series(df, path, hints):
+    # exports of the crawler tables carry the ingest-time plain text
+    if "text_plain" in df.columns:
+        print("  text: using 'text_plain'")
+        return df["text_plain"].fillna("").astype(str).str.strip()
     if "text" in hints and hints["text"] in df.columns:
         col = hints["text"]
         if col == "record":
@@ -1,7 +1,6 @@
 import psycopg2
 import pandas as pd
 import re
-from bs4 import BeautifulSoup
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
 import warnings
@@ -15,43 +14,36 @@ def get_db_connection():
         password="cs515"
     )
 
-def strip_html(text):
-    if not text or pd.isna(text):
-        return ""
-    soup = BeautifulSoup(str(text), 'html.parser')
-    return soup.get_text()
-
 def load_platform_text(platform, start_date='2025-11-01', end_date='2025-11-15', limit=None):
-    """Load all text from platform."""
+    """
+    Load all text from platform. Uses the crawler's text_plain column
+    (HTML already stripped for 4chan; post text plus link card for bsky),
+    so rows crawled before it existed need backfill_text.py first.
+    """
     conn = get_db_connection()
     
     limit_clause = f"LIMIT {limit}" if limit else ""
     
     if platform == 'bsky':
         query = f"""
-            SELECT 
-                COALESCE(data->'record'->>'text', '') as post_text,
-                COALESCE(data->'embed'->'external'->>'title', '') as link_title,
-                COALESCE(data->'embed'->'external'->>'description', '') as link_desc
+            SELECT text_plain as text
             FROM posts_bsky
             WHERE created_at >= '{start_date}'
               AND created_at < '{end_date}'
+              AND text_plain IS NOT NULL
             {limit_clause}
         """
-        df = pd.read_sql(query, conn)
-        df['text'] = df['post_text'] + ' ' + df['link_title'] + ' ' + df['link_desc']
     else:
         query = f"""
-            SELECT data->>'com' as text
+            SELECT text_plain as text
             FROM posts_4chan
             WHERE board_name = '{platform}'
               AND created_at >= '{start_date}'
               AND created_at < '{end_date}'
-              AND data->>'com' IS NOT NULL
+              AND text_plain <> ''
             {limit_clause}
         """
-        df = pd.read_sql(query, conn)
-        df['text'] = df['text'].apply(strip_html)
+    df = pd.read_sql(query, conn)
     
     conn.close()
     return df['text'].fillna('').tolist()